@@ -20,23 +20,44 @@ Assumptions:
 
 from __future__ import annotations
 
+import atexit
 import base64
+import functools
 import json
 import logging
 import os
+import re
+import sys
 import time as pytime
-import uuid
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import date, datetime, time as dtime, timedelta
+from threading import Lock, Thread
 from typing import Dict, List, Tuple
 
 import gspread
-from dateutil import parser
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
-from oauth2client.service_account import ServiceAccountCredentials
+from google.oauth2.service_account import Credentials as SACredentials
 # --- retry helpers ---
 from requests.exceptions import SSLError, ConnectionError, ReadTimeout
 
+# Shared pool for overlapping independent Sheets reads within one request.
+_SHEETS_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("SHEETS_POOL_WORKERS", "4")))
+
+# Hold-race protection: per-(date, room) locks serialize threads in this
+# process; HOLD_VERIFY additionally re-reads the slot window after writing a
+# HOLD so writers in sibling gunicorn workers detect losing a race.
+HOLD_VERIFY = os.getenv("HOLD_VERIFY", "true").lower() == "true"
+_hold_locks: Dict[tuple, Lock] = defaultdict(Lock)
+
+# Optional fast JSON (5-10x stdlib); everything falls back to json if absent.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # ===============================
 # Logging
 # ===============================
@@ -44,21 +65,109 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(level=getattr(logging, LOG_LEVEL, logging.INFO),
                     format="%(asctime)s - %(levelname)s - %(message)s")
 
+
+def _dumps(obj) -> str:
+    """Pretty-dump for log lines via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str).decode()
+    return json.dumps(obj, indent=2, default=str)
+
+
+def _debug_on() -> bool:
+    """Skip building debug payloads (dumps, range lists) when DEBUG is off."""
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def _info_on() -> bool:
+    """Skip building INFO log arguments (e.g. response dumps) when muted."""
+    return logging.getLogger().isEnabledFor(logging.INFO)
+
 # ===============================
 # Flask
 # ===============================
 app = Flask(__name__)
-CORS(app)  # For Dialogflow Messenger in browsers
+# /webhook is server-to-server (Dialogflow never sends browser CORS
+# preflights), so only the browser-facing debug endpoints pay for the
+# CORS before/after-request pass.
+CORS(app, resources={r"/debug/*": {"origins": "*"}})
+
+if orjson is not None:
+    from flask.json.provider import JSONProvider
+
+    class _OrjsonProvider(JSONProvider):
+        """Route jsonify through orjson's C encoder."""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=str).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            # Build the body straight from orjson's bytes; the base class
+            # would decode to str only for Flask to re-encode to UTF-8.
+            if args and kwargs:
+                raise TypeError("app.json.response() takes either args or kwargs, not both")
+            if not args:
+                obj = kwargs
+            elif len(args) == 1:
+                obj = args[0]
+            else:
+                obj = list(args)
+            return app.response_class(orjson.dumps(obj, default=str),
+                                      mimetype="application/json")
+
+    app.json = _OrjsonProvider(app)
+
+
+def _prebaked_json(payload: dict) -> bytes:
+    """Serialize a never-changing payload once, at import time."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+
+_HEALTHZ_BYTES = _prebaked_json({"ok": True})
+
 
 # Healthcheck for Render
 @app.route("/healthz", methods=["GET"])
 def healthz():
-    return jsonify({"ok": True})
+    return app.response_class(_HEALTHZ_BYTES, mimetype="application/json")
 
 # ===============================
-# Session Store (local, per-process)
+# Session Store (Redis when REDIS_URL is set, else local per-process dict)
 # ===============================
-session_store: Dict[str, Dict] = {}
+REDIS_URL = os.getenv("REDIS_URL")
+_redis = None
+if REDIS_URL:
+    try:
+        import redis
+        _redis = redis.Redis(
+            connection_pool=redis.ConnectionPool.from_url(
+                REDIS_URL,
+                decode_responses=True,
+                max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "64")),
+            )
+        )
+        _redis.ping()
+        logging.info("🔌 Session store backed by Redis at %s", REDIS_URL.split("@")[-1])
+    except Exception:
+        logging.exception("Redis unavailable — falling back to in-process session store")
+        _redis = None
+
+# In-process fallback: bounded LRU so memory stays flat without Redis.
+SESSION_STORE_MAX = int(os.getenv("SESSION_STORE_MAX", "10000"))
+session_store: "OrderedDict[str, Dict]" = OrderedDict()
+_session_store_lock = Lock()
+
+_REDIS_SESSION_PREFIX = "session:"
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+# Per-booking keys "booking:active:<student_id>|<dd/mm/YYYY>". Bookings are
+# only ever for today/tomorrow, so a 2-day TTL lets stale entries expire on
+# their own instead of accreting in one unbounded hash.
+_REDIS_BOOKING_PREFIX = "booking:active:"
+_BOOKING_KEY_TTL = 2 * 86400
 
 
 def get_session_id(req) -> str:
@@ -66,21 +175,62 @@ def get_session_id(req) -> str:
     return req.get("session", "unknown_session")
 
 
+def _normalize_value(v):
+    """
+    Dates/datetimes become ISO strings at store time, so buffered params are
+    plain JSON types and every downstream dump (log, Redis, response) skips
+    the per-value default= callback.
+    """
+    return v.isoformat() if isinstance(v, (datetime, date)) else v
+
+
 def update_session_store(session_id: str, new_params: dict | None):
-    existing = session_store.get(session_id, {})
+    existing = get_stored_params(session_id)
     for k, v in (new_params or {}).items():
-        if v not in ["", None, []]:
-            existing[k] = v
-    session_store[session_id] = existing
-    logging.debug("🧠 Updated session_store[%s]: %s", session_id,
-                  json.dumps(session_store[session_id], indent=2, default=str))
+        if v not in _EMPTY:
+            # Interned keys are shared across every session's dict, so N
+            # sessions cost one copy of each key string instead of N.
+            existing[sys.intern(k)] = _normalize_value(v)
+    _put_stored_params(session_id, existing)
+    if _debug_on():
+        logging.debug("🧠 Updated session_store[%s]: %s", session_id, _dumps(existing))
 
 
 def get_stored_params(session_id: str) -> dict:
+    if _redis is not None:
+        try:
+            # GET + EXPIRE in one pipeline round-trip: reading a session
+            # slides its TTL, so an active conversation never expires
+            # between turns just because it only read state.
+            key = _REDIS_SESSION_PREFIX + session_id
+            pipe = _redis.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.expire(key, SESSION_TTL_SECONDS)
+            raw = pipe.execute()[0]
+            return json.loads(raw) if raw else {}
+        except Exception:
+            logging.exception("Redis read failed; using local store")
     return session_store.get(session_id, {})
 
 
+def _put_stored_params(session_id: str, params: dict):
+    if _redis is not None:
+        try:
+            _redis.setex(_REDIS_SESSION_PREFIX + session_id, SESSION_TTL_SECONDS,
+                         json.dumps(params))
+            return
+        except Exception:
+            logging.exception("Redis write failed; using local store")
+    with _session_store_lock:
+        session_store[session_id] = params
+        session_store.move_to_end(session_id)
+        while len(session_store) > SESSION_STORE_MAX:
+            session_store.popitem(last=False)
+
+
 def _dbg_kv(label: str, obj: dict):
+    if not _debug_on():
+        return
     try:
         logging.debug("🔎 %s:", label)
         if not isinstance(obj, dict):
@@ -93,33 +243,57 @@ def _dbg_kv(label: str, obj: dict):
     except Exception:
         logging.exception("debug print failed for %s", label)
         
+def _retryable_api_error(e) -> bool:
+    """Quota/backend errors worth retrying; 4xx validation errors are not."""
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return status in (429, 500, 502, 503)
+
+
 def _with_retries(fn, *args, **kwargs):
     """
     Call a function that performs a Google Sheets request, with retries
-    for transient HTTPS/TLS/network errors.
+    for transient HTTPS/TLS/network errors and quota/backend APIErrors
+    (429/5xx). Backoff is exponential with jitter so a burst of workers
+    doesn't retry in lockstep; a server-sent Retry-After wins if present.
     Env:
       SHEETS_RETRY_ATTEMPTS (default 5)
       SHEETS_RETRY_BASE     (default 0.4 seconds)
     """
+    import random
     import time
     max_attempts = int(os.getenv("SHEETS_RETRY_ATTEMPTS", "5"))
     base = float(os.getenv("SHEETS_RETRY_BASE", "0.4"))
     for attempt in range(1, max_attempts + 1):
         try:
             return fn(*args, **kwargs)
+        except gspread.exceptions.APIError as e:
+            if attempt == max_attempts or not _retryable_api_error(e):
+                raise
+            retry_after = getattr(e, "response", None)
+            retry_after = retry_after.headers.get("Retry-After") if retry_after is not None else None
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = base * (2 ** (attempt - 1))
+            logging.warning("⚠️ Sheets APIError (attempt %d/%d), retrying in %.1fs", attempt, max_attempts, delay)
+            time.sleep(delay + random.uniform(0, base))
         except (SSLError, ConnectionError, ReadTimeout):
             if attempt == max_attempts:
                 raise
-            time.sleep(base * (2 ** (attempt - 1)))
+            time.sleep(base * (2 ** (attempt - 1)) + random.uniform(0, base))
 
 # ===============================
 # Carry-over helpers (persist partial inputs)
 # ===============================
-CARRY_KEYS = (
+CARRY_KEYS = frozenset((
     "date", "explicit_date", "booking_time", "room_size",
     "room_category", "student_id", "room_type", "room_id",
     "slots", "time"
-)
+))
+
+# Shared "treat as missing" sentinel — built once instead of per comparison site.
+_EMPTY = ("", None, [])
+
 
 def _carry_turn_params_to_store(req) -> dict:
     """
@@ -128,7 +302,7 @@ def _carry_turn_params_to_store(req) -> dict:
     checkAvailability wont ask for all the data again, only ask for missing ones.
     """
     turn_params = (req.get("queryResult", {}) or {}).get("parameters", {}) or {}
-    carry = {k: v for k, v in turn_params.items() if k in CARRY_KEYS and v not in ("", None, [])}
+    carry = {k: v for k, v in turn_params.items() if k in CARRY_KEYS and v not in _EMPTY}
     if carry:
         update_session_store(get_session_id(req), carry)
     return carry
@@ -146,6 +320,13 @@ ALLOW_UNTIL_MIDNIGHT = os.getenv("ALLOW_UNTIL_MIDNIGHT", "false").lower() == "tr
 LIB_OPEN = dtime(OPEN_HOUR, 0)
 LIB_CLOSE = dtime(CLOSE_HOUR, 0)
 
+# Precomputed second-of-day bounds for the time validator.
+_OPEN_SEC = OPEN_HOUR * 3600
+_CLOSE_SEC = CLOSE_HOUR * 3600
+_MAX_BOOKING_SEC = MAX_BOOKING_HOURS * 3600
+# ALLOW_UNTIL_MIDNIGHT is fixed at import, so the effective close is too.
+_EFFECTIVE_CLOSE_SEC = 24 * 3600 if ALLOW_UNTIL_MIDNIGHT else _CLOSE_SEC
+
 MIN_GROUP = 1
 MAX_GROUP = 9
 
@@ -161,11 +342,13 @@ ROOM_TYPE_DISPLAY = {
     "DISCUSSION-S": "Small discussion room",
     "DISCUSSION-M": "Medium discussion room",
     "DISCUSSION-L": "Large discussion room",
+    "": "room",  # preseeded fallback so the getter is a single dict hit
+    None: "room",
 }
 
 
 def _display_room_type(code: str) -> str:
-    return ROOM_TYPE_DISPLAY.get(code, code or "room")
+    return ROOM_TYPE_DISPLAY.get(code) or code
 
 
 _def_plur = lambda n: "" if str(n) == "1" else "s"  # noqa: E731
@@ -236,8 +419,35 @@ def _load_service_account():
     raise RuntimeError("Missing GOOGLE_SA_JSON / GOOGLE_SA_JSON_B64 / GOOGLE_SA_KEYFILE / GOOGLE_APPLICATION_CREDENTIALS")
 
 
-_creds = ServiceAccountCredentials.from_json_keyfile_dict(_load_service_account(), _scope)
+def _tune_http_session(client):
+    """
+    Mount a pooled keep-alive HTTPAdapter on the gspread session so repeated
+    Sheets calls reuse TLS connections instead of re-handshaking, and ask for
+    gzip'd payloads — full-sheet reads shrink ~5-10x on the wire.
+    """
+    try:
+        from requests.adapters import HTTPAdapter
+        session = getattr(client, "session", None) or client.http_client.session
+        adapter = HTTPAdapter(
+            pool_connections=int(os.getenv("SHEETS_HTTP_POOL_CONNECTIONS", "10")),
+            pool_maxsize=int(os.getenv("SHEETS_HTTP_POOL_MAXSIZE", "10")),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({"Accept-Encoding": "gzip"})
+        # Bound every Sheets call; without this a dropped connection can
+        # hold a worker thread far past the webhook's response budget.
+        try:
+            client.http_client.set_timeout(float(os.getenv("SHEETS_HTTP_TIMEOUT", "10")))
+        except AttributeError:
+            pass
+    except Exception:
+        logging.exception("HTTP session tuning failed; continuing with defaults")
+
+
+_creds = SACredentials.from_service_account_info(_load_service_account(), scopes=_scope)
 _client = gspread.authorize(_creds)
+_tune_http_session(_client)
 
 if SPREADSHEET_ID:
     sh = _client.open_by_key(SPREADSHEET_ID)
@@ -246,24 +456,113 @@ else:
     sh = _client.open(SHEET_TITLE)
 
 
-def _ensure_worksheet(title: str, headers: List[str]):
-    """Open or create worksheet, enforce EXACT header row, and shrink columns to len(headers)."""
+def _headers_flag_ok(title: str) -> bool:
+    """Cross-worker 'headers already verified' flag (Redis, 24h TTL)."""
+    if _redis is None:
+        return False
+    try:
+        return bool(_redis.get(f"sheets:hdrs_ok:{title}"))
+    except Exception:
+        return False
+
+
+def _headers_flag_set(title: str):
+    if _redis is None:
+        return
+    try:
+        _redis.setex(f"sheets:hdrs_ok:{title}", 86400, "1")
+    except Exception:
+        logging.exception("Failed to set headers-ok flag for %s", title)
+
+
+# Production boots on a known-good spreadsheet can skip the per-worker
+# header verification round-trips entirely (each gunicorn worker repeats
+# them otherwise). Leave unset for first deploys / fresh sheets.
+SKIP_HEADER_CHECK = os.getenv("SKIP_HEADER_CHECK", "false").lower() == "true"
+
+
+# On-disk marker for restarts without Redis: records a fingerprint of the
+# enforced schema so warm boots on the same instance skip the row reads.
+_HEADERS_MARKER = os.getenv("HEADERS_MARKER_FILE", ".headers_ok")
+
+
+def _headers_fingerprint() -> str:
+    import hashlib
+    return hashlib.md5(repr((HEADERS_ROOMS, HEADERS_SCHEDULE, HEADERS_BOOKINGS)).encode()).hexdigest()
+
+
+def _headers_marker_ok() -> bool:
+    try:
+        with open(_HEADERS_MARKER, "r", encoding="utf-8") as f:
+            return f.read().strip() == _headers_fingerprint()
+    except OSError:
+        return False
+
+
+def _headers_marker_set():
+    try:
+        with open(_HEADERS_MARKER, "w", encoding="utf-8") as f:
+            f.write(_headers_fingerprint())
+    except OSError:
+        logging.exception("Could not write headers marker %s", _HEADERS_MARKER)
+
+
+_HEADERS_MARKER_OK = _headers_marker_ok()
+
+
+def _prefetch_header_rows() -> dict:
+    """
+    One values batchGet covering all three header rows, so a cold boot that
+    actually needs verification pays 1 read RPC instead of 3. Any failure
+    (e.g. a tab that does not exist yet) falls back to the per-sheet reads.
+    """
+    if SKIP_HEADER_CHECK or _HEADERS_MARKER_OK:
+        return {}
+    titles = (WS_ROOMS, WS_SCHEDULE, WS_BOOKINGS)
+    try:
+        res = _with_retries(sh.values_batch_get, [f"{t}!1:1" for t in titles])
+        return {t: (vr.get("values") or [[]])[0]
+                for t, vr in zip(titles, res.get("valueRanges", []))}
+    except Exception:
+        logging.exception("Header batchGet failed; using per-sheet reads")
+        return {}
+
+
+def _ensure_worksheet(title: str, headers: List[str], header_row: List[str] | None = None):
+    """
+    Open or create worksheet, enforce EXACT header row, and shrink columns to
+    len(headers). On warm starts the enforcement write is skipped: the env
+    override, the local marker file, or the cross-worker Redis flag says
+    headers were verified recently, or a single row read shows they match.
+    """
     try:
         ws = sh.worksheet(title)
     except gspread.WorksheetNotFound:
         default_rows = 2000 if title == WS_SCHEDULE else 200
         ws = sh.add_worksheet(title=title, rows=default_rows, cols=max(26, len(headers)))
-    ws.update("A1", [headers])
-    ws.resize(rows=max(ws.row_count, 1), cols=len(headers))
+        header_row = None  # fresh tab; re-read rather than trust the prefetch
+    if SKIP_HEADER_CHECK or _HEADERS_MARKER_OK or _headers_flag_ok(title):
+        return ws
+    if header_row is None:
+        header_row = _with_retries(ws.row_values, 1)
+    if header_row != headers:
+        ws.update("A1", [headers])
+        ws.resize(rows=max(ws.row_count, 1), cols=len(headers))
+    _headers_flag_set(title)
     return ws
 
 
-ws_rooms = _ensure_worksheet(WS_ROOMS, HEADERS_ROOMS)
-ws_schedule = _ensure_worksheet(WS_SCHEDULE, HEADERS_SCHEDULE)
-ws_bookings = _ensure_worksheet(WS_BOOKINGS, HEADERS_BOOKINGS)
+_header_rows = _prefetch_header_rows()
+ws_rooms = _ensure_worksheet(WS_ROOMS, HEADERS_ROOMS, _header_rows.get(WS_ROOMS))
+ws_schedule = _ensure_worksheet(WS_SCHEDULE, HEADERS_SCHEDULE, _header_rows.get(WS_SCHEDULE))
+ws_bookings = _ensure_worksheet(WS_BOOKINGS, HEADERS_BOOKINGS, _header_rows.get(WS_BOOKINGS))
+if not _HEADERS_MARKER_OK:
+    _headers_marker_set()
 
 
 def _seed_rooms_if_empty():
+    if SKIP_HEADER_CHECK:
+        return  # known-good sheet; skip the boot-time probe too
     values = _with_retries(ws_rooms.get_all_values)
     if len(values) > 1:
         return
@@ -276,7 +575,7 @@ def _seed_rooms_if_empty():
         rows.append([f"M-{i:02d}", "medium", 4, 6])
     for i in range(1, ROOM_COUNTS["large"] + 1):
         rows.append([f"L-{i:02d}", "large", 7, 9])
-    _with_retries(ws_rooms.append_rows, rows)
+    _with_retries(ws_rooms.append_rows, rows, value_input_option="RAW")
 
 
 
@@ -300,29 +599,59 @@ def slots_from_period(start_dt: datetime, end_dt: datetime) -> List[int]:
     start_slot = dt_to_slot_index(start_dt)
     return [start_slot + i for i in range(total_slots)]
 
+
+def slots_to_csv(slots: List[int]) -> str:
+    """Compact encoding for the slots_json cell, e.g. [1, 2, 3] -> '1,2,3'."""
+    return ",".join(str(int(round(x))) for x in (slots or []))
+
+
+def slots_from_csv(raw) -> List[int]:
+    """
+    Decode a slots cell. Accepts the compact CSV form ('1,2,3') and the
+    legacy JSON form ('[1, 2, 3]') still present in older Bookings rows.
+    """
+    if not raw:
+        return []
+    if isinstance(raw, (list, tuple)):
+        return [int(round(x)) for x in raw]
+    s = str(raw).strip()
+    if s.startswith("["):
+        return [int(round(x)) for x in json.loads(s)]
+    return [int(x) for x in s.split(",") if x]
+
 # ===============================
 # Helpers: size → category/type
 # ===============================
 def _size_to_int(room_size) -> int | None:
-    if isinstance(room_size, int):
+    # Ordered by what Dialogflow actually sends: floats first, then ints/strs.
+    t = type(room_size)
+    if t is float:
+        i = int(room_size)
+        return i if i == room_size else None
+    if t is int:
         return room_size
-    if isinstance(room_size, float) and float(room_size).is_integer():
-        return int(room_size)
-    if isinstance(room_size, str) and room_size.strip().isdigit():
-        return int(room_size.strip())
+    if t is str:
+        s = room_size.strip()
+        return int(s) if s.isdigit() else None
     return None
 
 
+@functools.lru_cache(maxsize=32)
+def _category_for_size(n: int) -> str | None:
+    if not (MIN_GROUP <= n <= MAX_GROUP):
+        return None
+    return "solo" if n == 1 else "discussion"
+
+
 def auto_category_from_size(room_size) -> str | None:
     """
     Returns 'solo' if size == 1, 'discussion' if 2..9, else None.
+    Normalized to int first so the memoized lookup has a hashable key.
     """
     n = _size_to_int(room_size)
     if n is None:
         return None
-    if not (MIN_GROUP <= n <= MAX_GROUP):
-        return None
-    return "solo" if n == 1 else "discussion"
+    return _category_for_size(n)
 
 
 def normalize_room_size(room_size) -> int | None:
@@ -332,26 +661,42 @@ def normalize_room_size(room_size) -> int | None:
     return n if (MIN_GROUP <= n <= MAX_GROUP) else None
 
 
+# Precomputed size -> discussion bucket for the fixed 2..9 domain.
+_DISCUSSION_TYPE_BY_SIZE = {
+    **{n: "DISCUSSION-S" for n in (2, 3)},
+    **{n: "DISCUSSION-M" for n in (4, 5, 6)},
+    **{n: "DISCUSSION-L" for n in (7, 8, 9)},
+}
+
+
 def room_type_from_size_and_category(room_size, room_category) -> str | None:
     """Return an internal room_type code mapped to size(category)."""
-    n = _size_to_int(room_size)
     cat = (room_category or "").strip().lower()
     if cat == "solo":
         return "SOLO-1"
     if cat == "discussion":
-        if 2 <= n <= 3:
-            return "DISCUSSION-S"
-        if 4 <= n <= 6:
-            return "DISCUSSION-M"
-        if 7 <= n <= 9:
-            return "DISCUSSION-L"
+        return _DISCUSSION_TYPE_BY_SIZE.get(_size_to_int(room_size))
     return None
 
 # ===============================
 # Schedule sheet access & utils
 # ===============================
+@functools.lru_cache(maxsize=256)
 def _date_str(d: date) -> str:
-    return d.strftime("%d/%m/%Y")
+    # f-string beats the libc strftime path, and the cache makes repeat
+    # formats of today/tomorrow a single dict hit.
+    return f"{d.day:02d}/{d.month:02d}/{d.year:04d}"
+
+
+def _time_str_12h(dt: datetime) -> str:
+    """hh:mm AM/PM without strftime (same output as '%I:%M %p')."""
+    h = dt.hour % 12 or 12
+    return f"{h:02d}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
+
+
+def _fast_ddmmyyyy(s: str) -> date:
+    """Parse the fixed dd/mm/YYYY format ~10x faster than strptime."""
+    return date(int(s[6:10]), int(s[3:5]), int(s[:2]))
 
 
 def _coalesce_slots(slots: List[int]) -> List[Tuple[int, int]]:
@@ -371,39 +716,46 @@ def _coalesce_slots(slots: List[int]) -> List[Tuple[int, int]]:
     return runs
 
 
+# Column letters for S1..S24 (D..AA), precomputed once so the A1 helpers
+# below are a list index + f-string instead of a rowcol_to_a1 call per cell.
+_SLOT_COL_LETTERS = [gspread.utils.rowcol_to_a1(1, 3 + s)[:-1] for s in range(1, 25)]
+
+# Shared blank S1..S24 tail for new Schedule rows. Safe to share: every use
+# concatenates (building a fresh list) rather than mutating it.
+_EMPTY_SLOT_CELLS = [""] * 24
+
+
 def _slot_run_to_a1_range(row_idx: int, s: int, e: int) -> str:
     # S1 is column D (4) → S_k is column 3 + k
-    col_start = 3 + s
-    col_end = 3 + e
-    a1_start = gspread.utils.rowcol_to_a1(row_idx, col_start)
-    a1_end = gspread.utils.rowcol_to_a1(row_idx, col_end)
-    return f"{a1_start}:{a1_end}"
+    return f"{_SLOT_COL_LETTERS[s - 1]}{row_idx}:{_SLOT_COL_LETTERS[e - 1]}{row_idx}"
 
 
-def slots_free(row_idx: int, slots: List[int]) -> bool:
-    """Batch-read minimal contiguous blocks and check any non-empty."""
+def occupy_slots_if_free(row_idx: int, slots: List[int], booking_id: str) -> bool:
+    """
+    Check-and-occupy in 2 API calls total (was 2 per contiguous run):
+    ONE batch_get over all runs, verify client-side, then ONE batch_update.
+    Returns False (writing nothing) if any target cell is already taken.
+
+    Sheets has no transactions, so a race window remains between the read
+    and the write — acceptable under the 'single user at a time' assumption.
+    """
     runs = _coalesce_slots(slots)
-    for s, e in runs:
-        a1 = _slot_run_to_a1_range(row_idx, s, e)
-        block_wrapped = _with_retries(ws_schedule.batch_get, [a1])
-        block = block_wrapped[0] if block_wrapped else []
+    ranges = [_slot_run_to_a1_range(row_idx, s, e) for s, e in runs]
+    blocks = _with_retries(ws_schedule.batch_get, ranges)
+    for block in blocks or []:
         for row in block:
             for cell in row:
                 if cell:
                     return False
-    return True
-
-
-def occupy_slots(row_idx: int, slots: List[int], booking_id: str):
-    """Batch-write contiguous blocks in as few ranges as possible."""
-    updates = []
-    for s, e in _coalesce_slots(slots):
-        a1 = _slot_run_to_a1_range(row_idx, s, e)
-        width = e - s + 1
-        updates.append({"range": a1, "values": [[booking_id] * width]})
-    logging.debug("occupy_slots() updating ranges: %s", [u["range"] for u in updates])
+    updates = [
+        {"range": a1, "values": [[booking_id] * (e - s + 1)]}
+        for a1, (s, e) in zip(ranges, runs)
+    ]
+    if _debug_on():
+        logging.debug("occupy_slots_if_free() updating ranges: %s", [u["range"] for u in updates])
     if updates:
         _with_retries(ws_schedule.batch_update, updates)
+    return True
 
 
 def free_slots(row_idx: int, slots: List[int]):
@@ -413,17 +765,57 @@ def free_slots(row_idx: int, slots: List[int]):
         a1 = _slot_run_to_a1_range(row_idx, s, e)
         width = e - s + 1
         updates.append({"range": a1, "values": [[""] * width]})
-    logging.debug("free_slots() clearing ranges: %s", [u["range"] for u in updates])
+    if _debug_on():
+        logging.debug("free_slots() clearing ranges: %s", [u["range"] for u in updates])
     if updates:
         ws_schedule.batch_update(updates)
 
 
+# Bookings change slowly (one per student per day), so 30s staleness is safe;
+# writes through this process warm/invalidate the cache themselves.
+BOOKINGS_CACHE_TTL = float(os.getenv("BOOKINGS_CACHE_TTL", "30"))
+_bookings_cache = {"ts": 0.0, "values": None, "index": None}
+
+
+def _bookings_values_cached() -> List[List[str]]:
+    """Full Bookings sheet (raw values incl. header), cached for a short TTL."""
+    now = pytime.monotonic()
+    if _bookings_cache["values"] is None or now - _bookings_cache["ts"] > BOOKINGS_CACHE_TTL:
+        _bookings_cache["values"] = _with_retries(ws_bookings.get_all_values)
+        _bookings_cache["index"] = None
+        _bookings_cache["ts"] = now
+    return _bookings_cache["values"]
+
+
+def _invalidate_bookings_cache():
+    _bookings_cache["values"] = None
+    _bookings_cache["index"] = None
+
+
+def _active_bookings_for(student_id, date_str: str) -> List[Tuple[int, dict]]:
+    """
+    O(1) lookup of active booking rows for (student_id, date). The index is
+    built once per cache fill from the same values snapshot the linear scans
+    used to walk.
+    """
+    _bookings_values_cached()
+    idx = _bookings_cache["index"]
+    if idx is None:
+        idx = {}
+        for r_idx, rec in _bookings_list_with_row_indexes():
+            if (rec.get("status") or "").lower() == "active":
+                key = (str(rec.get("student_id")), rec.get("date"))
+                idx.setdefault(key, []).append((r_idx, rec))
+        _bookings_cache["index"] = idx
+    return idx.get((str(student_id), date_str), [])
+
+
 def _bookings_list_with_row_indexes():
     """
     Returns a list of tuples (row_idx, rec_dict) for Bookings.
     row_idx is 1-based; header is row 1.
     """
-    values = _with_retries(ws_bookings.get_all_values)
+    values = _bookings_values_cached()
     if not values:
         return []
     header = values[0]
@@ -483,39 +875,61 @@ def release_hold_for_state(date_obj: date, room_id: str, slots: List[int], sid:
 
 
 
+# Shared (date, room_id) -> row_idx map for Schedule, built from one
+# get_all_values and reused by every ScheduleIndex instance in the process.
+# Row positions only change when this app appends, so a short TTL plus
+# explicit invalidation after our own writes keeps it correct.
+SCHEDULE_CACHE_TTL = float(os.getenv("SCHEDULE_CACHE_TTL", "15"))
+_schedule_cache = {"ts": 0.0, "by_date": None}
+_schedule_cache_lock = Lock()
+
+
+def _schedule_maps() -> Dict[str, Dict[str, int]]:
+    now = pytime.monotonic()
+    with _schedule_cache_lock:
+        if _schedule_cache["by_date"] is None or now - _schedule_cache["ts"] > SCHEDULE_CACHE_TTL:
+            values = _with_retries(ws_schedule.get_all_values)
+            by_date: Dict[str, Dict[str, int]] = {}
+            for r_idx in range(2, len(values) + 1):
+                row = values[r_idx - 1]
+                if len(row) >= 2 and row[0] and row[1]:
+                    by_date.setdefault(row[0], {})[row[1]] = r_idx
+            _schedule_cache["by_date"] = by_date
+            _schedule_cache["ts"] = now
+        return _schedule_cache["by_date"]
+
+
+def _invalidate_schedule_cache():
+    with _schedule_cache_lock:
+        _schedule_cache["by_date"] = None
+
+
 class ScheduleIndex:
     def __init__(self, ws, ws_rooms):
         self.ws = ws
         self.ws_rooms = ws_rooms
         self.index_by_date: Dict[str, Dict[str, int]] = {}  # date_str -> {room_id: row_idx}
-        self.row_count_snapshot = None
-
-    def _load_all_for_date(self, date_str: str):
-        """Build {room_id -> row_idx} for a given date with ONE API call."""
-        values = _with_retries(self.ws.get_all_values)
-        idx_map: Dict[str, int] = {}
-        for r_idx in range(2, len(values) + 1):
-            row = values[r_idx - 1]
-            if len(row) >= 2 and row[0] == date_str and row[1]:
-                idx_map[row[1]] = r_idx
-        self.index_by_date[date_str] = idx_map
-        try:
-            self.row_count_snapshot = self.ws.row_count
-        except Exception:
-            self.row_count_snapshot = len(values)
+
+    def _load_all_for_date(self, date_str: str, force: bool = False):
+        """Build {room_id -> row_idx} for a given date from the shared cache."""
+        if force:
+            _invalidate_schedule_cache()
+        self.index_by_date[date_str] = dict(_schedule_maps().get(date_str, {}))
 
     def get_map(self, date_str: str) -> Dict[str, int]:
         if date_str not in self.index_by_date:
             self._load_all_for_date(date_str)
         return self.index_by_date[date_str]
 
-    def ensure_rows_for_bucket(self, date_str: str, bucket: str):
+    def ensure_rows_for_bucket(self, date_str: str, bucket: str, room_records=None):
         """
         Make sure every room in the bucket has a row for date_str.
         Do ONE append_rows for all missing rooms, auto-grow if needed.
+        Callers that already fetched Rooms can pass room_records to skip the read.
         """
         idx_map = self.get_map(date_str)
-        room_records = _with_retries(self.ws_rooms.get_all_records, expected_headers=HEADERS_ROOMS)
+        if room_records is None:
+            room_records = _rooms_in_bucket(bucket)
         bucket_rooms: List[Tuple[str, str]] = [
             (r["room_id"], r["room_type"]) for r in room_records if r.get("room_type") == bucket
         ]
@@ -529,18 +943,13 @@ class ScheduleIndex:
         if current_rows - 1 < needed_rows:
             _with_retries(self.ws.add_rows, max(100, needed_rows))
 
-        empty_slots = ["" for _ in range(24)]
-        to_append = [[date_str, rid, rtype] + empty_slots for rid, rtype in missing]
+        to_append = [[date_str, rid, rtype] + _EMPTY_SLOT_CELLS for rid, rtype in missing]
         _with_retries(self.ws.append_rows, to_append)
-        self._load_all_for_date(date_str)
+        self._load_all_for_date(date_str, force=True)
 
     @staticmethod
     def slots_to_a1(row_idx: int, slots: List[int]) -> List[str]:
-        a1s = []
-        for s in slots:
-            col = 3 + int(s)  # S1 is col D(4) => 3 + 1
-            a1s.append(gspread.utils.rowcol_to_a1(row_idx, col))
-        return a1s
+        return [f"{_SLOT_COL_LETTERS[int(s) - 1]}{row_idx}" for s in slots]
 
 
 def _slot_block_columns(slots: List[int]) -> Tuple[int, int]:
@@ -551,24 +960,52 @@ def _slot_block_columns(slots: List[int]) -> Tuple[int, int]:
 
 def _slot_range_a1(row_idx: int, slot_l: int, slot_r: int) -> str:
     """Return a single A1 range covering the slot window for a row, e.g., 'T14:W14'."""
-    col_l = 3 + slot_l
-    col_r = 3 + slot_r
-    a1_l = gspread.utils.rowcol_to_a1(row_idx, col_l)
-    a1_r = gspread.utils.rowcol_to_a1(row_idx, col_r)
-    return f"{a1_l}:{a1_r}"
+    return _slot_run_to_a1_range(row_idx, slot_l, slot_r)
 
 # ===============================
 # Room picking
 # ===============================
+ROOMS_CACHE_TTL = float(os.getenv("ROOMS_CACHE_TTL", "300"))
+_rooms_cache = {"ts": 0.0, "records": None, "by_bucket": None}
+
+
+def _records_from_values(rows: List[List[str]], headers: List[str]) -> List[dict]:
+    """Zip data rows against a known header list (rows may be ragged)."""
+    pad = len(headers)
+    return [dict(zip(headers, r + [""] * (pad - len(r)))) for r in rows]
+
+
+# Headers are enforced at boot, so reads can skip the header row entirely.
+_ROOMS_DATA_RANGE = f"A2:{chr(ord('A') + len(HEADERS_ROOMS) - 1)}"
+
+
+def _rooms_records_cached() -> List[dict]:
+    """Rooms is effectively static — cache the record dicts for ROOMS_CACHE_TTL."""
+    now = pytime.monotonic()
+    if _rooms_cache["records"] is None or now - _rooms_cache["ts"] > ROOMS_CACHE_TTL:
+        rows = _with_retries(ws_rooms.get, _ROOMS_DATA_RANGE) or []
+        records = _records_from_values(rows, HEADERS_ROOMS)
+        by_bucket: Dict[str, List[dict]] = {}
+        for r in records:
+            by_bucket.setdefault(r.get("room_type", ""), []).append(r)
+        _rooms_cache["records"] = records
+        _rooms_cache["by_bucket"] = by_bucket
+        _rooms_cache["ts"] = now
+    return _rooms_cache["records"]
+
+
+def _rooms_in_bucket(bucket: str) -> List[dict]:
+    """Per-bucket room records, grouped once per cache refresh."""
+    _rooms_records_cached()
+    return _rooms_cache["by_bucket"].get(bucket, [])
+
+
 def list_rooms_by_type(room_bucket: str) -> List[Tuple[str, str, int, int]]:
-    data = _with_retries(ws_rooms.get_all_records, expected_headers=HEADERS_ROOMS)
-    out = []
-    for r in data:
-        if r.get("room_type") == room_bucket:
-            out.append((r["room_id"], r["room_type"], int(r["capacity_min"]), int(r["capacity_max"])))
-    return out
+    return [(r["room_id"], r["room_type"], int(r["capacity_min"]), int(r["capacity_max"]))
+            for r in _rooms_in_bucket(room_bucket)]
 
 
+@functools.lru_cache(maxsize=32)
 def bucket_from_internal_type(internal_code: str) -> str:
     if internal_code == "SOLO-1":
         return "solo"
@@ -581,29 +1018,169 @@ def bucket_from_internal_type(internal_code: str) -> str:
 # ===============================
 # Booking + cancellation (Sheets)
 # ===============================
+_booking_index_hydrated = False
+
+
+def _booking_key(student_id, date_str: str) -> str:
+    return f"{_REDIS_BOOKING_PREFIX}{student_id}|{date_str}"
+
+
+def _hydrate_booking_index():
+    """One Sheets read to seed the Redis active-booking keys on first use."""
+    global _booking_index_hydrated
+    if _booking_index_hydrated or _redis is None:
+        return
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        for _r_idx, rec in _bookings_list_with_row_indexes():
+            if rec.get("status") == "active":
+                pipe.setex(_booking_key(rec.get("student_id"), rec.get("date")),
+                           _BOOKING_KEY_TTL, "1")
+        pipe.execute()
+        _booking_index_hydrated = True
+    except Exception:
+        logging.exception("Booking index hydration failed; falling back to sheet scans")
+
+
 def has_active_booking(student_id: str, date_str: str) -> bool:
-    rows = _with_retries(ws_bookings.get_all_records, expected_headers=HEADERS_BOOKINGS)
-    for r in rows:
-        if str(r.get("student_id")) == str(student_id) and r.get("date") == date_str and r.get("status") == "active":
-            return True
-    return False
+    if _redis is not None:
+        try:
+            _hydrate_booking_index()
+            if _booking_index_hydrated:
+                return bool(_redis.exists(_booking_key(student_id, date_str)))
+        except Exception:
+            logging.exception("Redis booking lookup failed; using sheet scan")
+    return bool(_active_bookings_for(student_id, date_str))
+
+
+def _booking_index_add(student_id: str, date_str: str):
+    if _redis is not None:
+        try:
+            _redis.setex(_booking_key(student_id, date_str), _BOOKING_KEY_TTL, "1")
+        except Exception:
+            logging.exception("Redis booking index add failed")
 
 
-def append_booking_row(bkg: dict):
-    _with_retries(ws_bookings.append_row, [
-        bkg["booking_id"], bkg["student_id"], bkg["date"], bkg["start_time"], bkg["end_time"],
-        bkg["room_type"], bkg["room_id"], json.dumps(bkg["slots"]), bkg["created_at"], bkg["status"]
-    ])
+def _booking_index_remove(student_id: str, date_str: str):
+    if _redis is not None:
+        try:
+            _redis.delete(_booking_key(student_id, date_str))
+        except Exception:
+            logging.exception("Redis booking index remove failed")
+
+
+# Optional write-behind queue: booking rows buffer in memory and flush in one
+# append_rows call every BOOKINGS_FLUSH_INTERVAL seconds. Off by default —
+# direct appends keep read-after-write semantics for single-user deployments.
+BOOKINGS_WRITE_BEHIND = os.getenv("BOOKINGS_WRITE_BEHIND", "false").lower() == "true"
+# Optional fire-and-forget confirm: the HOLD already reserves the slots, so
+# the HOLD→booking_id rewrite and Bookings append may land after the reply.
+# Off by default — synchronous finalize surfaces write failures to the user.
+FINALIZE_ASYNC = os.getenv("FINALIZE_ASYNC", "false").lower() == "true"
+BOOKINGS_FLUSH_INTERVAL = float(os.getenv("BOOKINGS_FLUSH_INTERVAL", "2"))
+BOOKINGS_FLUSH_MAX = int(os.getenv("BOOKINGS_FLUSH_MAX", "50"))
+_pending_booking_rows: deque = deque()
+_pending_bookings_lock = Lock()
+_booking_flusher_started = False
+
+
+def _flush_pending_bookings() -> int:
+    """Drain the queue in append_rows batches of at most BOOKINGS_FLUSH_MAX."""
+    batches = []
+    with _pending_bookings_lock:
+        while _pending_booking_rows:
+            batches.append([_pending_booking_rows.popleft()
+                            for _ in range(min(len(_pending_booking_rows), BOOKINGS_FLUSH_MAX))])
+    if not batches:
+        return 0
+    # RAW skips Sheets-side value parsing; every cell is written verbatim.
+    if len(batches) == 1:
+        _with_retries(ws_bookings.append_rows, batches[0], value_input_option="RAW")
+    else:
+        # Burst drain: overlap the append RTTs instead of paying them in
+        # sequence (Sheets allocates append rows server-side, so concurrent
+        # calls are safe).
+        futs = [_SHEETS_POOL.submit(_with_retries, ws_bookings.append_rows,
+                                    b, value_input_option="RAW")
+                for b in batches]
+        for f in futs:
+            f.result()
+    return sum(len(b) for b in batches)
+
+
+def _booking_flusher_loop():
+    while True:
+        pytime.sleep(BOOKINGS_FLUSH_INTERVAL)
+        try:
+            _flush_pending_bookings()
+        except Exception:
+            logging.exception("Write-behind booking flush failed")
+
+
+def _start_booking_flusher_once():
+    global _booking_flusher_started
+    if _booking_flusher_started:
+        return
+    with _pending_bookings_lock:
+        if _booking_flusher_started:
+            return
+        Thread(target=_booking_flusher_loop, name="bookings-flusher", daemon=True).start()
+        atexit.register(_flush_pending_bookings)
+        _booking_flusher_started = True
+
+
+@dataclass(slots=True)
+class BookingRecord:
+    """One Bookings row; slots=True keeps it at fixed attribute storage."""
+    booking_id: str
+    student_id: str
+    date: str
+    start_time: str
+    end_time: str
+    room_type: str
+    room_id: str
+    slots: List[int]
+    created_at: str
+    status: str = "active"
+
+    def as_row(self) -> list:
+        return [self.booking_id, self.student_id, self.date, self.start_time,
+                self.end_time, self.room_type, self.room_id,
+                slots_to_csv(self.slots), self.created_at, self.status]
+
+
+def append_booking_row(bkg: BookingRecord):
+    row = bkg.as_row()
+    if BOOKINGS_WRITE_BEHIND:
+        _start_booking_flusher_once()
+        with _pending_bookings_lock:
+            _pending_booking_rows.append(row)
+    else:
+        _with_retries(ws_bookings.append_row, row)
+    # Keep the short-TTL cache warm instead of forcing a refetch. The write
+    # also restarts the TTL clock: we just mirrored the sheet's new tail, so
+    # the snapshot is as fresh as a GET would be.
+    if _bookings_cache["values"] is not None:
+        vals = _bookings_cache["values"]
+        srow = [str(c) for c in row]
+        vals.append(srow)
+        idx = _bookings_cache["index"]
+        if idx is not None:
+            # Extend the (student_id, date) index in place — no rebuild.
+            rec = dict(zip(vals[0], srow))
+            idx.setdefault((str(bkg.student_id), bkg.date), []).append((len(vals), rec))
+        _bookings_cache["ts"] = pytime.monotonic()
+    _booking_index_add(bkg.student_id, bkg.date)
 
 
 def find_and_hold_room_for_period(date_obj: date, start_dt: datetime, end_dt: datetime,
                                   internal_room_type: str, student_id: str):
     """
-    Optimized: 3–5 API calls total.
+    Optimized: 2–3 API calls total.
     1) Build per-date index (1 call)
-    2) Ensure rows for all rooms in bucket (0–2 calls)
-    3) Batch read candidate rows for slot window (1 call)
-    4) Batch write HOLD for chosen row/slots (1 call)
+    2) Batch read slot window for rooms that already have a row (0–1 calls)
+    3) Write the HOLD: batch_update on an existing row, or one append_row
+       with the HOLD cells baked in when the room has no row yet (1 call)
 
     NOTE: We only enforce "already_booked" for normalized 7-digit IDs.
     """
@@ -618,55 +1195,96 @@ def find_and_hold_room_for_period(date_obj: date, start_dt: datetime, end_dt: da
 
     dstr = _date_str(date_obj)
 
+    # Fan out the three independent Sheets reads (bookings, rooms, schedule)
+    # so the webhook waits for the slowest RTT instead of their sum.
     norm_sid = normalize_student_id(student_id)
-    if norm_sid and has_active_booking(norm_sid, dstr):
-        return None, None, "already_booked"
+    fut_booked = _SHEETS_POOL.submit(has_active_booking, norm_sid, dstr) if norm_sid else None
+    fut_rooms = _SHEETS_POOL.submit(_rooms_records_cached)
 
     sched_ix = ScheduleIndex(ws_schedule, ws_rooms)
-    sched_ix.ensure_rows_for_bucket(dstr, bucket)
-
-    idx_map = sched_ix.get_map(dstr)
-    room_records = _with_retries(ws_rooms.get_all_records, expected_headers=HEADERS_ROOMS)
-    candidate_room_ids = [r["room_id"] for r in room_records if r.get("room_type") == bucket and r["room_id"] in idx_map]
-    if not candidate_room_ids:
-        return None, None, "no_availability"
+    idx_map = sched_ix.get_map(dstr)  # schedule read overlaps the futures above
 
-    sL, sR = _slot_block_columns(slots)
-    ranges = []
-    rows_for_room: Dict[str, int] = {}
-    for rid in candidate_room_ids:
-        row_idx = idx_map[rid]
-        rows_for_room[rid] = row_idx
-        ranges.append(_slot_range_a1(row_idx, sL, sR))
-
-    blocks = _with_retries(ws_schedule.batch_get, ranges)
-
-
-    chosen_room = None
-    for (rid, row_idx), block in zip(rows_for_room.items(), blocks):
-        row_vals = block[0] if (block and len(block) > 0) else []
-        all_free = True
-        for slot in slots:
-            offset = slot - sL
-            cell_val = row_vals[offset] if (0 <= offset < len(row_vals)) else ""
-            if cell_val:
-                all_free = False
-                break
-        if all_free:
-            chosen_room = (rid, row_idx)
-            break
+    room_records = fut_rooms.result()
+    if fut_booked is not None and fut_booked.result():
+        return None, None, "already_booked"
 
-    if not chosen_room:
+    bucket_rooms = _rooms_in_bucket(bucket)
+    if not bucket_rooms:
         return None, None, "no_availability"
 
-    room_id, row_idx = chosen_room
-    hold_tag = f"HOLD:{norm_sid or student_id}"
-
-    updates = [{"range": a1, "values": [[hold_tag]]} for a1 in ScheduleIndex.slots_to_a1(row_idx, slots)]
-    _with_retries(ws_schedule.batch_update, updates)
+    # Rooms without a Schedule row for this date are fully free by definition,
+    # so we no longer pre-create the whole bucket on a fresh day (that used to
+    # append a row per room before a single booking existed). Only rooms that
+    # already have a row need their slot window read.
+    idx_map = sched_ix.get_map(dstr)
+    rows_for_room: Dict[str, int] = {r["room_id"]: idx_map[r["room_id"]]
+                                     for r in bucket_rooms if r["room_id"] in idx_map}
 
+    sL, sR = _slot_block_columns(slots)
+    free_existing: Dict[str, bool] = {}
+    if rows_for_room:
+        ranges = [_slot_range_a1(row_idx, sL, sR) for row_idx in rows_for_room.values()]
+        blocks = _with_retries(ws_schedule.batch_get, ranges)
+        for rid, block in zip(rows_for_room, blocks):
+            row_vals = block[0] if (block and len(block) > 0) else []
+            free_existing[rid] = all(
+                not (row_vals[s - sL] if 0 <= s - sL < len(row_vals) else "")
+                for s in slots
+            )
+
+    # Scan in Rooms-sheet order so room priority is unchanged; a missing row
+    # counts as free. On a verify failure the loop simply falls through to
+    # the next candidate room instead of giving up.
+    hold_tag = f"HOLD:{norm_sid or student_id}"
+    for r in bucket_rooms:
+        room_id = r["room_id"]
+        row_idx = rows_for_room.get(room_id)
+
+        if row_idx is None:
+            # Lazily create the one row that actually gets the hold, with the
+            # HOLD tags baked into the appended cells — one write, no read.
+            with _hold_locks[(dstr, room_id)]:
+                new_row = [dstr, room_id, bucket] + _EMPTY_SLOT_CELLS
+                for s in slots:
+                    new_row[2 + s] = hold_tag
+                _with_retries(ws_schedule.append_row, new_row, value_input_option="RAW")
+                sched_ix._load_all_for_date(dstr, force=True)
+            return room_id, slots, None
+
+        if not free_existing.get(room_id):
+            continue
 
-    return room_id, slots, None
+        # Per-(date, room) lock serializes same-process threads for free;
+        # the verify read below covers writers in sibling workers.
+        with _hold_locks[(dstr, room_id)]:
+            updates = [{"range": a1, "values": [[hold_tag]]}
+                       for a1 in ScheduleIndex.slots_to_a1(row_idx, slots)]
+            _with_retries(ws_schedule.batch_update, updates)
+            if not HOLD_VERIFY:
+                return room_id, slots, None
+            # Emulated compare-and-swap: Sheets cells are last-write-wins, so
+            # re-read the window — if every target cell still carries our tag
+            # the hold stuck; otherwise a concurrent writer overwrote us, so
+            # release whatever is still ours and try the next room. This
+            # narrows (not closes — Sheets has no transactions) the race
+            # window between two workers holding the same slots.
+            block = _with_retries(ws_schedule.batch_get, [_slot_range_a1(row_idx, sL, sR)])
+            row_vals = block[0][0] if (block and block[0]) else []
+
+            def _cell(s):
+                off = s - sL
+                return row_vals[off] if 0 <= off < len(row_vals) else ""
+
+            if all(_cell(s) == hold_tag for s in slots):
+                return room_id, slots, None
+            clears = [{"range": a1, "values": [[""]]}
+                      for a1, s in zip(ScheduleIndex.slots_to_a1(row_idx, slots), slots)
+                      if _cell(s) == hold_tag]
+            if clears:
+                _with_retries(ws_schedule.batch_update, clears)
+            logging.warning("⚠️ Lost hold race for %s on %s; trying next room", room_id, dstr)
+
+    return None, None, "no_availability"
 
 
 def replace_hold_with_booking(row_idx: int, slots: List[int], booking_id: str):
@@ -674,21 +1292,19 @@ def replace_hold_with_booking(row_idx: int, slots: List[int], booking_id: str):
     Replace any HOLD:* value in the targeted cells with booking_id.
     Safe under the 'single user at a time' assumption.
     """
+    runs = _coalesce_slots(slots)
+    ranges = [_slot_run_to_a1_range(row_idx, s, e) for s, e in runs]
+    # ONE read across all runs, then ONE write (was one read per run).
+    blocks = _with_retries(ws_schedule.batch_get, ranges)
     updates = []
-    for s, e in _coalesce_slots(slots):
-        a1 = _slot_run_to_a1_range(row_idx, s, e)
-        block_wrapped = _with_retries(ws_schedule.batch_get, [a1])
-        block = block_wrapped[0] if block_wrapped else []
-        new_values = []
-        for row in block:
-            row_out = []
-            for cell in row:
-                if isinstance(cell, str) and cell.startswith("HOLD:"):
-                    row_out.append(booking_id)
-                else:
-                    row_out.append(cell or booking_id)
-            new_values.append(row_out)
-        updates.append({"range": a1, "values": new_values})
+    for i, (a1, (s, e)) in enumerate(zip(ranges, runs)):
+        width = e - s + 1
+        block = blocks[i] if blocks and i < len(blocks) else []
+        row = list(block[0]) if block else []
+        row += [""] * (width - len(row))  # trailing empties come back trimmed
+        new_row = [booking_id if (isinstance(c, str) and c.startswith("HOLD:")) or not c else c
+                   for c in row]
+        updates.append({"range": a1, "values": [new_row]})
     if updates:
         _with_retries(ws_schedule.batch_update, updates)
 
@@ -697,30 +1313,44 @@ def replace_hold_with_booking(row_idx: int, slots: List[int], booking_id: str):
 def finalize_booking(student_id: str, date_obj: date, start_dt: datetime, end_dt: datetime,
                      internal_room_type: str, room_id: str, slots: List[int]) -> str:
     dstr = _date_str(date_obj)
-    start_str = start_dt.strftime("%I:%M %p")
-    end_str = end_dt.strftime("%I:%M %p")
+    start_str = _time_str_12h(start_dt)
+    end_str = _time_str_12h(end_dt)
     # Booking ID pattern: BKG-XXXXXXXXXX (first 10 hex chars, uppercase)
+    import uuid
     booking_id = f"BKG-{uuid.uuid4().hex[:10].upper()}"
 
     row_idx = ensure_schedule_row(dstr, room_id, bucket_from_internal_type(internal_room_type))
-    replace_hold_with_booking(row_idx, slots, booking_id)
-
-    append_booking_row({
-        "booking_id": booking_id,
-        "student_id": student_id,
-        "date": dstr,
-        "start_time": start_str,
-        "end_time": end_str,
-        "room_type": internal_room_type,
-        "room_id": room_id,
-        "slots": slots,
-        "created_at": datetime.now().isoformat(timespec="seconds"),
-        "status": "active",
-    })
+    # The HOLD→booking_id swap (Schedule) and the row append (Bookings)
+    # touch different tabs and neither reads the other's write, so they
+    # run concurrently — the confirm leg pays one RTT instead of two.
+    # (values batchUpdate can't coalesce them: an append has no fixed
+    # range until the server assigns the row.)
+    fut_swap = _SHEETS_POOL.submit(replace_hold_with_booking, row_idx, slots, booking_id)
+    append_booking_row(BookingRecord(
+        booking_id=booking_id,
+        student_id=student_id,
+        date=dstr,
+        start_time=start_str,
+        end_time=end_str,
+        room_type=internal_room_type,
+        room_id=room_id,
+        slots=slots,
+        created_at=_now_iso(),
+    ))
+    fut_swap.result()  # surface swap errors before reporting success
     logging.info("✅ Booking appended: %s for student %s on %s", booking_id, student_id, dstr)
     return booking_id
 
 
+def _log_finalize_result(fut):
+    """Completion hook for FINALIZE_ASYNC submissions (_with_retries already
+    retried transient failures inside finalize_booking itself)."""
+    exc = fut.exception()
+    if exc is not None:
+        logging.error("❌ Async finalize failed; HOLD cells still reserve the slots "
+                      "but no Bookings row was written: %s", exc)
+
+
 def cancel_by_student_and_date(student_id: str, date_obj: date) -> int:
     """
     Batched cancellation:
@@ -732,31 +1362,33 @@ def cancel_by_student_and_date(student_id: str, date_obj: date) -> int:
     dstr = _date_str(date_obj)
     sid = str(student_id)
 
-    rows = _bookings_list_with_row_indexes()
+    # Kick off the Schedule map read now so it overlaps the Bookings scan
+    # below — the two reads are independent, same as the book path's fan-out.
+    sched_ix = ScheduleIndex(ws_schedule, ws_rooms)
+    fut_map = _SHEETS_POOL.submit(sched_ix.get_map, dstr)
+
     matches = []
-    for r_idx, rec in rows:
-        if (rec.get("student_id") == sid and
-                rec.get("date") == dstr and
-                (rec.get("status") or "").lower() == "active"):
-            try:
-                slots = json.loads(rec.get("slots_json") or "[]")
-                slots = [int(round(x)) for x in slots]
-            except Exception:
-                slots = []
-            matches.append({
-                "bookings_row_idx": r_idx,
-                "room_id": rec.get("room_id") or "",
-                "room_type": rec.get("room_type") or "",
-                "slots": slots
-            })
+    for r_idx, rec in _active_bookings_for(sid, dstr):
+        try:
+            slots = slots_from_csv(rec.get("slots_json"))
+        except Exception:
+            slots = []
+        matches.append({
+            "bookings_row_idx": r_idx,
+            "room_id": rec.get("room_id") or "",
+            "room_type": rec.get("room_type") or "",
+            "slots": slots
+        })
 
     if not matches:
         return 0
 
-    sched_ix = ScheduleIndex(ws_schedule, ws_rooms)
-    idx_map = sched_ix.get_map(dstr)
+    idx_map = fut_map.result()
 
-    clear_updates = []
+    # Slot clears (Schedule) and status flips (Bookings) go out in ONE
+    # spreadsheet-level values batchUpdate: sheet-qualified ranges let a
+    # single RPC mutate both tabs, halving write-quota cost per cancel.
+    data = []
     for m in matches:
         rid = m["room_id"]
         slots = m["slots"]
@@ -766,19 +1398,19 @@ def cancel_by_student_and_date(student_id: str, date_obj: date) -> int:
         if not row_idx:
             continue
         for a1 in ScheduleIndex.slots_to_a1(row_idx, slots):
-            clear_updates.append({"range": a1, "values": [[""]]})
-    if clear_updates:
-        _with_retries(ws_schedule.batch_update, clear_updates)
+            data.append({"range": f"{WS_SCHEDULE}!{a1}", "values": [[""]]})
 
     status_col = HEADERS_BOOKINGS.index("status") + 1
-    status_updates = []
     for m in matches:
-        r_idx = m["bookings_row_idx"]
-        a1 = gspread.utils.rowcol_to_a1(r_idx, status_col)
-        status_updates.append({"range": a1, "values": [["cancelled"]]})
-    if status_updates:
-        _with_retries(ws_bookings.batch_update, status_updates)
+        a1 = gspread.utils.rowcol_to_a1(m["bookings_row_idx"], status_col)
+        data.append({"range": f"{WS_BOOKINGS}!{a1}", "values": [["cancelled"]]})
+
+    if data:
+        _with_retries(sh.values_batch_update,
+                      {"valueInputOption": "RAW", "data": data})
 
+    _invalidate_bookings_cache()
+    _booking_index_remove(sid, dstr)
 
     return len(matches)
 
@@ -791,130 +1423,181 @@ def ensure_schedule_row(date_str: str, room_id: str, room_type_bucket: str) -> i
     m = ix.get_map(date_str)
     if room_id in m:
         return m[room_id]
-    empty_slots = ["" for _ in range(24)]
-    _with_retries(ws_schedule.append_row, [date_str, room_id, room_type_bucket] + empty_slots)
+    _with_retries(ws_schedule.append_row, [date_str, room_id, room_type_bucket] + _EMPTY_SLOT_CELLS)
 
-    ix._load_all_for_date(date_str)
+    ix._load_all_for_date(date_str, force=True)
     return ix.get_map(date_str)[room_id]
 
 # ===============================
 # Dialogflow helpers: contexts & state
 # ===============================
-CTX_MENU = "awaiting_menu"
-CTX_BOOKING = "booking_info"
-CTX_CHECK_FLOW = "check_flow"
-CTX_READY_TO_BOOK = "ready_to_book"
-CTX_AWAIT_CONFIRM = "awaiting_confirmation"
+# Interned so lookups keyed by these names hit the identity fast-path.
+CTX_MENU = sys.intern("awaiting_menu")
+CTX_BOOKING = sys.intern("booking_info")
+CTX_CHECK_FLOW = sys.intern("check_flow")
+CTX_READY_TO_BOOK = sys.intern("ready_to_book")
+CTX_AWAIT_CONFIRM = sys.intern("awaiting_confirmation")
+
+# Relative context-name suffixes, concatenated once per request with the
+# session prefix instead of re-formatting an f-string per context.
+_CTX_SUFFIXES = {c: "/contexts/" + c for c in
+                 (CTX_MENU, CTX_BOOKING, CTX_CHECK_FLOW, CTX_READY_TO_BOOK, CTX_AWAIT_CONFIRM)}
+
+
+_NO_CTX = ({}, 0)
+
+
+def _ctx_index(req) -> Dict[str, Tuple[dict, int]]:
+    """
+    Per-request index of outputContexts: short_name -> (parameters, lifespan).
+    Built on first use and cached on the request dict so every getter below
+    is an O(1) lookup instead of a list scan. One build serves the whole
+    request: collect_by_steps, _sticky_outcontexts and the confirm/cancel
+    handlers all read through this same dict.
+    """
+    cached = req.get("_ctx_idx")
+    if cached is None:
+        cached = {
+            c.get("name", "").rsplit("/", 1)[-1].lower():
+                (c.get("parameters") or {}, c.get("lifespanCount", 0))
+            for c in req.get("queryResult", {}).get("outputContexts", [])
+        }
+        req["_ctx_idx"] = cached
+    return cached
+
+
+def _ctx_entry(req, ctx_name) -> Tuple[dict, int]:
+    """Index lookup with a direct hit first; .lower() only on a miss, since
+    our CTX_* constants (and Dialogflow's names) are already lowercase."""
+    ix = _ctx_index(req)
+    hit = ix.get(ctx_name)
+    if hit is None:
+        hit = ix.get(ctx_name.lower(), _NO_CTX)
+    return hit
 
 
 def _get_ctx_params(req, ctx_name=CTX_BOOKING):
-    for c in req["queryResult"].get("outputContexts", []):
-        if ctx_name in c.get("name", ""):
-            return c.get("parameters", {}) or {}
-    return {}
+    return _ctx_entry(req, ctx_name)[0]
 
 
 def _has_ctx(req, ctx_name):
-    for c in req["queryResult"].get("outputContexts", []):
-        if ctx_name in c.get("name", "") and c.get("lifespanCount", 0) > 0:
-            return True
-    return False
+    return _ctx_entry(req, ctx_name)[1] > 0
 
 
 def get_param(req, name, ctx_name="booking_info"):
     val = req.get("queryResult", {}).get("parameters", {}).get(name)
-    if val not in ("", None, []):
+    if val not in _EMPTY:
         return val
-    for c in req.get("queryResult", {}).get("outputContexts", []):
-        if ctx_name in c.get("name", ""):
-            v = c.get("parameters", {}).get(name)
-            if v not in ("", None, []):
-                return v
-    return None
+    v = _ctx_entry(req, ctx_name)[0].get(name)
+    return v if v not in _EMPTY else None
 
 
 def get_from_ctx(req, ctx_suffix, key):
-    for c in req.get("queryResult", {}).get("outputContexts", []):
-        name = c.get("name", "").lower()
-        if name.endswith(f"/{ctx_suffix.lower()}"):
-            v = (c.get("parameters") or {}).get(key)
-            if v not in ("", None, []):
-                return v
-    return None
+    v = _ctx_entry(req, ctx_suffix)[0].get(key)
+    return v if v not in _EMPTY else None
 
 
 def get_param_from_steps(req, key, step_ctx_suffix, booking_ctx="booking_info"):
     v = req.get("queryResult", {}).get("parameters", {}).get(key)
-    if v not in ("", None, []):
+    if v not in _EMPTY:
         return v
     v = get_from_ctx(req, step_ctx_suffix, key)
-    if v not in ("", None, []):
+    if v not in _EMPTY:
         return v
     return get_param(req, key, ctx_name=booking_ctx)
 
 
+# Readiness bits for the three fields the booking flow needs.
+_READY_DATE, _READY_TIME, _READY_SIZE = 1, 2, 4
+_READY_ALL = _READY_DATE | _READY_TIME | _READY_SIZE
+
+# Which step context each field may arrive in (beyond turn params / booking_info).
+_STEP_CTX_FOR_KEY = {
+    "date": "prompt_time",
+    "explicit_date": "prompt_time",
+    "booking_time": "prompt_time",
+    "room_size": "prompt_category",
+    "room_category": CTX_AWAIT_CONFIRM,
+    "student_id": CTX_AWAIT_CONFIRM,
+    "room_type": CTX_AWAIT_CONFIRM,
+    "room_id": CTX_AWAIT_CONFIRM,
+    "slots": CTX_AWAIT_CONFIRM,
+    "time": CTX_AWAIT_CONFIRM,
+}
+
+
 def collect_by_steps(req):
     """
     Prefer: current turn params -> step specific ctx -> booking_info ctx -> session_store
+    One table-driven sweep over the shared _ctx_index; every source probe is
+    an O(1) dict lookup.
     """
     store = get_stored_params(get_session_id(req)) or {}
-
-    def _pick(key, step_ctx_suffix):
-        v = get_param_from_steps(req, key, step_ctx_suffix)   # turn / step ctx / booking ctx
-        return v if v not in ("", None, []) else store.get(key)
-
-    return {
-        "date":           _pick("date", "prompt_time"),
-        "explicit_date":  _pick("explicit_date", "prompt_time"),
-        "booking_time":   _pick("booking_time", "prompt_time"),
-        "room_size":      _pick("room_size", "prompt_category"),
-        "room_category":  _pick("room_category", "awaiting_confirmation"),
-        "student_id":     _pick("student_id", "awaiting_confirmation"),
-        "room_type":      _pick("room_type", "awaiting_confirmation"),
-        "room_id":        _pick("room_id", "awaiting_confirmation"),
-        "slots":          _pick("slots", "awaiting_confirmation"),
-        "time":           _pick("time", "awaiting_confirmation"),
-    }
+    turn = (req.get("queryResult", {}) or {}).get("parameters", {}) or {}
+    ctx_ix = _ctx_index(req)
+    booking_ctx = ctx_ix.get(CTX_BOOKING, _NO_CTX)[0]
+
+    out = {}
+    for key, step in _STEP_CTX_FOR_KEY.items():
+        for src in (turn, ctx_ix.get(step, _NO_CTX)[0], booking_ctx):
+            v = src.get(key)
+            if v not in _EMPTY:
+                break
+        else:
+            v = store.get(key)
+        out[key] = v
+
+    # Readiness bitmask, computed once here instead of re-probing the dict.
+    mask = 0
+    if out["date"]:
+        mask |= _READY_DATE
+    if out["booking_time"]:
+        mask |= _READY_TIME
+    if out["room_size"]:
+        mask |= _READY_SIZE
+    out["_ready_mask"] = mask
+    return out
 
 
 STICKY_LIFESPAN = 50
 
 
-def _ctx_obj(req, params: dict, ctx_name=CTX_BOOKING, lifespan=5):
-    return {
-        "name": f"{req['session']}/contexts/{ctx_name}",
-        "lifespanCount": lifespan,
-        "parameters": params,
-    }
-
-
-def _merge_ctx_params(existing: dict, new_params: dict) -> dict:
-    return {**(existing or {}), **(new_params or {})}
-
-
 def _sticky_outcontexts(req, booking_params=None, extra_ctx=None, keep_menu=False):
     session_id = get_session_id(req)
-    base = _get_ctx_params(req, CTX_BOOKING)
-    merged = _merge_ctx_params(base, booking_params or {})
+    # One copy of the booking ctx, updated in place. (The copy matters: the
+    # base dict lives in the shared per-request _ctx_index.)
+    merged = dict(_get_ctx_params(req, CTX_BOOKING))
+    if booking_params:
+        merged.update(booking_params)
+    merged.pop("_ready_mask", None)  # internal flag; never emitted/stored
+    # Unfilled slots arrive as None/''/[] — drop them so every turn's payload
+    # stays small. Nothing downstream changes: update_session_store skips
+    # empties anyway and collect_by_steps treats absent and empty the same.
+    merged = {k: v for k, v in merged.items() if v not in _EMPTY}
     _dbg_kv("STICKY MERGED (about to write)", merged)
 
-    out = []
-    out.append(_ctx_obj(req, merged, CTX_BOOKING, lifespan=STICKY_LIFESPAN))
+    session = req["session"]
+    out = [{"name": session + _CTX_SUFFIXES[CTX_BOOKING],
+            "lifespanCount": STICKY_LIFESPAN, "parameters": merged}]
     update_session_store(session_id, merged)
 
-    for item in (extra_ctx or []):
+    for item in (extra_ctx or ()):
         if isinstance(item, tuple) and len(item) == 2:
-            nm, life = item
-            out.append({"name": f"{req['session']}/contexts/{nm}", "lifespanCount": life})
+            out.append({"name": session + _CTX_SUFFIXES.get(item[0], "/contexts/" + item[0]),
+                        "lifespanCount": item[1]})
         elif isinstance(item, str):
-            out.append({"name": f"{req['session']}/contexts/{item}", "lifespanCount": STICKY_LIFESPAN})
+            out.append({"name": session + _CTX_SUFFIXES.get(item, "/contexts/" + item),
+                        "lifespanCount": STICKY_LIFESPAN})
 
     if not keep_menu:
-        out.append({"name": f"{req['session']}/contexts/{CTX_MENU}", "lifespanCount": 0})
+        out.append({"name": session + _CTX_SUFFIXES[CTX_MENU], "lifespanCount": 0})
 
     return out
 
 
+_SID_RE = re.compile(r"\d{7}")
+
+
 def normalize_student_id(val) -> str | None:
     """
     Accepts int/float/str from Dialogflow and returns a clean 7-digit string.
@@ -922,17 +1605,21 @@ def normalize_student_id(val) -> str | None:
     - Strings with spaces → stripped
     - Anything else → None
     """
-    if val in ("", None, []):
+    if val in _EMPTY:
         return None
     try:
+        # Numeric fast path: one range compare instead of str() + char walk.
         if isinstance(val, float) and float(val).is_integer():
-            s = str(int(val))
-        elif isinstance(val, int):
-            s = str(val)
-        else:
-            s = str(val).strip()
-            if s.endswith(".0"):
-                s = s[:-2]
+            val = int(val)
+        if isinstance(val, int):
+            return str(val) if 1_000_000 <= val <= 9_999_999 else None
+        s = str(val).strip()
+        if s.endswith(".0"):
+            s = s[:-2]
+        # Clean 7-digit strings match in one C-level pass; the char-wise
+        # digit filter only runs for inputs typed with spaces/punctuation.
+        if _SID_RE.fullmatch(s):
+            return s
         s = "".join(ch for ch in s if ch.isdigit())
         return s if len(s) == 7 else None
     except Exception:
@@ -976,9 +1663,135 @@ RESPONSE = {
     "cancel_confirm": "Got it. The booking has been cancelled.",
 }
 
+# Welcome/library texts never change, so split them into Dialogflow
+# messages once.
+_WELCOME_LINES = [ln for ln in RESPONSE["welcome"].split("\n") if ln.strip()]
+_WELCOME_MESSAGES = [{"text": {"text": [ln]}} for ln in _WELCOME_LINES]
+_LIBRARY_INFO_LINES = [ln for ln in RESPONSE["library_info"].split("\n") if ln.strip()]
+_LIBRARY_INFO_MESSAGES = [{"text": {"text": [ln]}} for ln in _LIBRARY_INFO_LINES]
+
+# Validator messages, resolved once — the hot path compares against and
+# returns these without re-indexing RESPONSE per call.
+_MSG_MISSING_TIME = RESPONSE["missing_time"]
+_MSG_INVALID_TIME = RESPONSE["invalid_time"]
+_MSG_OUTSIDE_HOURS = RESPONSE["outside_hours"]
+_MSG_TOO_LONG = RESPONSE["too_long"]
+_MSG_ALREADY_BOOKED = RESPONSE["already_booked"]
+_MSG_CANCEL_CONFIRM = RESPONSE["cancel_confirm"]
+_MSG_LIBRARY_INFO = RESPONSE["library_info"]
+_MSG_HALF_HOUR = "⚠ Please book on 30-minute boundaries (e.g., 2:00–4:00 or 2:30–4:30)."
+
+# Recurring prompt bodies, built once; handlers copy the template and
+# attach the per-request outputContexts (the only field that varies).
+_PROMPT_DATE = {"fulfillmentText": "📅 Please input the date — today or tomorrow?"}
+_PROMPT_TIME = {"fulfillmentText": "🕒 What time would you like? (e.g., 2 PM to 4 PM)"}
+_PROMPT_SIZE = {"fulfillmentText": "👥 How many people will use the room? (e.g., 1 or 3)"}
+_PROMPT_BAD_SIZE = {"fulfillmentText": "I couldn't understand the group size. Please enter a number between 1 and 9."}
+
+
+def _prompt(template: dict, out_ctx: list, **extra):
+    resp = template.copy()
+    resp["outputContexts"] = out_ctx
+    if extra:
+        resp.update(extra)
+    return jsonify(resp)
+
 # ===============================
 # Date & time parsing/validation
 # ===============================
+_dateutil_parser = None
+
+
+def _dp():
+    """Lazy-load dateutil.parser (~50ms import) off the cold-start path."""
+    global _dateutil_parser
+    if _dateutil_parser is None:
+        from dateutil import parser as _p
+        _dateutil_parser = _p
+    return _dateutil_parser
+
+
+# Two compiled scans cover every format the old strptime-attempt loop did:
+# dd/mm/YYYY and dd-mm-YYYY here, YYYY/mm/dd below (YYYY-mm-dd is ISO and
+# takes the fromisoformat path first).
+_DMY_RE = re.compile(r"^(\d{1,2})[/-](\d{1,2})[/-](\d{4})$")
+_YMD_RE = re.compile(r"^(\d{4})[/-](\d{1,2})[/-](\d{1,2})$")
+_ONE_DAY = timedelta(days=1)
+
+
+def _today() -> date:
+    """date.today(), computed at most once per request via flask.g."""
+    try:
+        t = getattr(g, "_today", None)
+        if t is None:
+            t = date.today()
+            g._today = t
+        return t
+    except RuntimeError:  # outside a request context
+        return date.today()
+
+
+def _now_iso() -> str:
+    """ISO timestamp (seconds), likewise computed at most once per request."""
+    try:
+        t = getattr(g, "_now_iso", None)
+        if t is None:
+            t = datetime.now().isoformat(timespec="seconds")
+            g._now_iso = t
+        return t
+    except RuntimeError:
+        return datetime.now().isoformat(timespec="seconds")
+
+
+def _tomorrow() -> date:
+    """today + 1 day, likewise computed at most once per request."""
+    try:
+        t = getattr(g, "_tomorrow", None)
+        if t is None:
+            t = _today() + _ONE_DAY
+            g._tomorrow = t
+        return t
+    except RuntimeError:
+        return _today() + _ONE_DAY
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_iso(s: str) -> datetime:
+    """
+    Dialogflow sends RFC3339, which the C-level datetime.fromisoformat
+    handles ~10x faster than dateutil; fall back to dateutil for anything odd.
+    The runtime is pinned to Python 3.11, whose fromisoformat accepts the
+    trailing 'Z' directly — no string copy needed.
+    Memoized: the same start/end strings recur on every turn of a session
+    (sticky contexts replay them), and datetimes are immutable to share.
+    """
+    try:
+        return datetime.fromisoformat(s)
+    except ValueError:
+        return _dp().isoparse(s)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_date_str(s: str) -> date | None:
+    """Memoized parse of explicit date strings (not 'today'/'tomorrow')."""
+    m = _DMY_RE.match(s)
+    if m:
+        try:
+            return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+        except ValueError:
+            return None
+    m = _YMD_RE.match(s)
+    if m:
+        try:
+            return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        except ValueError:
+            return None
+    try:
+        return _parse_iso(s).date()
+    except Exception:
+        return None
+
+
 def parse_date(date_param):
     if not date_param:
         return None
@@ -986,34 +1799,18 @@ def parse_date(date_param):
         if isinstance(date_param, dict):
             for k in ("date_time", "startDate", "start_date", "start"):
                 if k in date_param and date_param[k]:
-                    return parser.isoparse(date_param[k]).date()
+                    return _parse_iso(date_param[k]).date()
             if "date" in date_param and date_param["date"]:
-                try:
-                    return parser.isoparse(date_param["date"]).date()
-                except Exception:
-                    pass
-                for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%Y-%m-%d"):
-                    try:
-                        return datetime.strptime(date_param["date"], fmt).date()
-                    except Exception:
-                        continue
+                return _parse_date_str(date_param["date"])
             return None
         if isinstance(date_param, str):
-            s = date_param.strip()
-            sl = s.lower()
+            # 90% case: Dialogflow's literal selectors — no parser involved.
+            sl = date_param.strip().lower()
             if sl == "today":
-                return date.today()
+                return _today()
             if sl == "tomorrow":
-                return date.today() + timedelta(days=1)
-            try:
-                return parser.isoparse(s).date()
-            except Exception:
-                pass
-            for fmt in ("%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%Y-%m-%d"):
-                try:
-                    return datetime.strptime(s, fmt).date()
-                except Exception:
-                    continue
+                return _tomorrow()
+            return _parse_date_str(date_param.strip())
         return None
     except Exception:
         logging.exception("Date parsing error")
@@ -1031,54 +1828,61 @@ def parse_and_validate_timeperiod(time_period):
     AM fallback: if user typed “10 to 12” and parser landed at night, try coercing to daytime.
     """
 
-    def _within_hours(s, e, opening_dt, closing_dt):
-        return opening_dt <= s < e <= closing_dt
-
     if not time_period or not isinstance(time_period, dict):
-        return False, RESPONSE["missing_time"], None, None, None
+        return False, _MSG_MISSING_TIME, None, None, None
 
     start_time = time_period.get("startTime")
     end_time = time_period.get("endTime")
     if not start_time or not end_time:
-        return False, RESPONSE["missing_time"], None, None, None
+        return False, _MSG_MISSING_TIME, None, None, None
 
     try:
-        start_obj = parser.isoparse(start_time)
-        end_obj = parser.isoparse(end_time)
+        return _validate_period_cached(start_time, end_time)
+    except TypeError:  # unhashable/odd payload — validate without the cache
+        return _validate_period_cached.__wrapped__(start_time, end_time)
+
+
+@functools.lru_cache(maxsize=1024)
+def _validate_period_cached(start_time: str, end_time: str):
+    """
+    Validation core, memoized on the raw start/end strings: every result
+    field (bool, shared message constant, str, immutable datetimes) is safe
+    to hand out repeatedly, and a session replays the same pair each turn.
+    """
+    try:
+        start_obj = _parse_iso(start_time)
+        end_obj = _parse_iso(end_time)
 
         same_day = (start_obj.date() == end_obj.date())
-        allows_2400 = (
-            ALLOW_UNTIL_MIDNIGHT and
-            end_obj == start_obj.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
-        )
-        if not same_day and not allows_2400:
-            return False, RESPONSE["invalid_time"], None, None, None
-
-        opening_dt = start_obj.replace(hour=OPEN_HOUR, minute=0, second=0, microsecond=0)
-        closing_dt = (
-            (start_obj.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1))
-            if ALLOW_UNTIL_MIDNIGHT else
-            start_obj.replace(hour=CLOSE_HOUR, minute=0, second=0, microsecond=0)
-        )
+        if not same_day:
+            allows_2400 = (
+                ALLOW_UNTIL_MIDNIGHT and
+                end_obj == start_obj.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            )
+            if not allows_2400:
+                return False, _MSG_INVALID_TIME, None, None, None
 
         duration = end_obj - start_obj
 
         def _validate_and_return(s, e):
-            duration_hours = (e - s).total_seconds() / 3600.0
-            if duration_hours - MAX_BOOKING_HOURS > 1e-6:
-                return False, RESPONSE["too_long"], None, None, None
+            if (e - s).total_seconds() > _MAX_BOOKING_SEC + 1e-3:
+                return False, _MSG_TOO_LONG, None, None, None
             if s.minute not in (0, 30) or e.minute not in (0, 30):
-                return False, "⚠ Please book on 30-minute boundaries (e.g., 2:00–4:00 or 2:30–4:30).", None, None, None
-            if not _within_hours(s, e, opening_dt, closing_dt):
-                return False, RESPONSE["outside_hours"], None, None, None
-            time_str = f"{s.strftime('%I:%M %p')} to {e.strftime('%I:%M %p')}"
+                return False, _MSG_HALF_HOUR, None, None, None
+            # Integer second-of-day comparison; a next-day end is the exact
+            # 24:00 crossing (only admitted above when ALLOW_UNTIL_MIDNIGHT).
+            s_sec = s.hour * 3600 + s.minute * 60 + s.second
+            e_sec = 24 * 3600 if e.date() != s.date() else e.hour * 3600 + e.minute * 60 + e.second
+            if not (_OPEN_SEC <= s_sec < e_sec <= _EFFECTIVE_CLOSE_SEC):
+                return False, _MSG_OUTSIDE_HOURS, None, None, None
+            time_str = f"{_time_str_12h(s)} to {_time_str_12h(e)}"
             return True, None, time_str, s, e
 
         ok, msg, time_str, s_ok, e_ok = _validate_and_return(start_obj, end_obj)
         if ok:
             return True, None, time_str, s_ok, e_ok
 
-        if msg == RESPONSE["outside_hours"]:
+        if msg is _MSG_OUTSIDE_HOURS:
             def _to_day_hour(h):
                 m = h % 12
                 return 12 if m == 0 else m
@@ -1096,7 +1900,13 @@ def parse_and_validate_timeperiod(time_period):
 
     except Exception:
         logging.exception("Time parsing failed")
-        return False, RESPONSE["invalid_time"], None, None, None
+        return False, _MSG_INVALID_TIME, None, None, None
+
+
+def _time_fingerprint(booking_time) -> str | None:
+    if isinstance(booking_time, dict):
+        return f"{booking_time.get('startTime')}|{booking_time.get('endTime')}"
+    return None
 
 
 def _commit_valid_time(state: dict, start_dt: datetime, end_dt: datetime, time_str: str):
@@ -1106,12 +1916,33 @@ def _commit_valid_time(state: dict, start_dt: datetime, end_dt: datetime, time_s
     state["startTime"] = start_dt.isoformat()
     state["endTime"] = end_dt.isoformat()
     state["time_str"] = time_str
+    state["time_fp"] = _time_fingerprint(state.get("booking_time"))
     return True
 
+
+def _validate_time_cached(state: dict):
+    """
+    Same contract as parse_and_validate_timeperiod, but when this exact
+    booking_time was already validated and committed on a previous turn
+    (fingerprint match), the stored result is reused instead of re-parsing.
+    """
+    fp = _time_fingerprint(state.get("booking_time"))
+    if fp and state.get("time_fp") == fp and state.get("startTime") and state.get("endTime"):
+        try:
+            return (True, None, state.get("time_str") or state.get("time"),
+                    datetime.fromisoformat(state["startTime"]),
+                    datetime.fromisoformat(state["endTime"]))
+        except (TypeError, ValueError):
+            pass
+    return parse_and_validate_timeperiod(state.get("booking_time"))
+
 # ===============================
 # Flow handlers
 # ===============================
 def _is_ready_to_book(state: dict) -> bool:
+    mask = state.get("_ready_mask")
+    if mask is not None:
+        return mask == _READY_ALL
     return bool(state.get("date") and state.get("booking_time") and state.get("room_size"))
 
 
@@ -1130,22 +1961,20 @@ def handle_flow(req):
     date_param = state.get("explicit_date") or state.get("date")
     date_obj = parse_date(date_param)
     if not date_obj:
-        return jsonify({
-            "fulfillmentText": "📅 Please input the date — today or tomorrow?",
-            "outputContexts": _sticky_outcontexts(req, state, keep_menu=True, extra_ctx=[("prompt_time", 3)]),
-        })
-    state["date"] = date_obj.strftime("%d/%m/%Y")
+        return _prompt(_PROMPT_DATE,
+                       _sticky_outcontexts(req, state, keep_menu=True, extra_ctx=[("prompt_time", 3)]))
+    state["date"] = _date_str(date_obj)
 
     state = _invalidate_staged_room_if_inputs_changed(req, state)
 
-    # 2) Time
-    if not state.get("booking_time"):
-        return jsonify({
-            "fulfillmentText": "🕒 What time would you like? (e.g., 2 PM to 4 PM)",
-            "outputContexts": _sticky_outcontexts(req, state, keep_menu=True, extra_ctx=[("prompt_time", 3)]),
-        })
+    # 2) Time — presence comes from the readiness mask collect_by_steps
+    # already computed; only present values pay for validation (cached by
+    # fingerprint in _validate_time_cached).
+    if not state["_ready_mask"] & _READY_TIME:
+        return _prompt(_PROMPT_TIME,
+                       _sticky_outcontexts(req, state, keep_menu=True, extra_ctx=[("prompt_time", 3)]))
 
-    ok, msg, time_str, start_dt, end_dt = parse_and_validate_timeperiod(state["booking_time"])
+    ok, msg, time_str, start_dt, end_dt = _validate_time_cached(state)
     if not ok:
         return jsonify({
             "fulfillmentText": f"⏱ {msg or 'Please provide a valid time range (e.g., 2 PM to 4 PM).'}",
@@ -1158,18 +1987,12 @@ def handle_flow(req):
     state = _invalidate_staged_room_if_inputs_changed(req, state)
 
     # 3) Size
-    if not state.get("room_size"):
-        return jsonify({
-            "fulfillmentText": "👥 How many people will use the room? (e.g., 1 or 3)",
-            "outputContexts": _sticky_outcontexts(req, state, keep_menu=True),
-        })
+    if not state["_ready_mask"] & _READY_SIZE:
+        return _prompt(_PROMPT_SIZE, _sticky_outcontexts(req, state, keep_menu=True))
 
     auto_cat = auto_category_from_size(state.get("room_size"))
     if not auto_cat:
-        return jsonify({
-            "fulfillmentText": "I couldn't understand the group size. Please enter a number between 1 and 9.",
-            "outputContexts": _sticky_outcontexts(req, state, keep_menu=True),
-        })
+        return _prompt(_PROMPT_BAD_SIZE, _sticky_outcontexts(req, state, keep_menu=True))
     state["room_category"] = auto_cat
     state = _invalidate_staged_room_if_inputs_changed(req, state)
 
@@ -1185,36 +2008,40 @@ def handle_welcome(req):
     try:
         st = collect_by_steps(req)
         if st.get("date") and st.get("room_id") and st.get("slots"):
-            date_obj = datetime.strptime(st["date"], "%d/%m/%Y").date()
+            date_obj = _fast_ddmmyyyy(st["date"])
             sid = normalize_student_id(st.get("student_id")) or "PENDING"
             release_hold_for_state(date_obj, st["room_id"], [int(round(x)) for x in (st["slots"] or [])], sid=sid)
     except Exception:
         logging.exception("Welcome cleanup failed")
-    session_id = get_session_id(req)
-    session_store[session_id] = {"booking_info": {}}
-    lines = [ln for ln in RESPONSE["welcome"].split("\n") if ln.strip()]
+    session = get_session_id(req)
+    _put_stored_params(session, {"booking_info": {}})
     return jsonify({
-        "fulfillmentMessages": [{"text": {"text": [ln]}} for ln in lines],
+        "fulfillmentMessages": _WELCOME_MESSAGES,
         "outputContexts": [
-            {"name": f"{req['session']}/contexts/{CTX_BOOKING}", "lifespanCount": 0},
-            {"name": f"{req['session']}/contexts/{CTX_CHECK_FLOW}", "lifespanCount": 0},
-            {"name": f"{req['session']}/contexts/{CTX_READY_TO_BOOK}", "lifespanCount": 0},
-            {"name": f"{req['session']}/contexts/{CTX_AWAIT_CONFIRM}", "lifespanCount": 0},
-            {"name": f"{req['session']}/contexts/{CTX_MENU}", "lifespanCount": 5},
+            {"name": session + _CTX_SUFFIXES[CTX_BOOKING], "lifespanCount": 0},
+            {"name": session + _CTX_SUFFIXES[CTX_CHECK_FLOW], "lifespanCount": 0},
+            {"name": session + _CTX_SUFFIXES[CTX_READY_TO_BOOK], "lifespanCount": 0},
+            {"name": session + _CTX_SUFFIXES[CTX_AWAIT_CONFIRM], "lifespanCount": 0},
+            {"name": session + _CTX_SUFFIXES[CTX_MENU], "lifespanCount": 5},
         ],
     })
 
 
-def handle_menu_check(req):
+def _menu_entry(req):
+    """
+    Shared body for Menu_CheckAvailability and Menu_BookRoom: normalize the
+    staged params once, then route to EVT_BOOK when everything needed is
+    already present or back to EVT_CHECK to keep collecting.
+    """
     # carry over any existing params from menu context to booking_info context
     _carry_turn_params_to_store(req)
     state = collect_by_steps(req)
     date_obj = parse_date(state.get("explicit_date") or state.get("date"))
-    ok_time, _msg_time, time_str, start_dt, end_dt = parse_and_validate_timeperiod(state.get("booking_time"))
+    ok_time, _msg_time, time_str, start_dt, end_dt = _validate_time_cached(state)
     size_norm = normalize_room_size(state.get("room_size"))
 
     if date_obj and ok_time and size_norm:
-        state["date"] = date_obj.strftime("%d/%m/%Y")
+        state["date"] = _date_str(date_obj)
         _commit_valid_time(state, start_dt, end_dt, time_str)
         state["time"] = time_str
         state["room_size"] = size_norm
@@ -1235,34 +2062,12 @@ def handle_menu_check(req):
     })
 
 
-def handle_menu_book(req):
-    # carry over any existing params from menu context to booking_info context
-    _carry_turn_params_to_store(req)
-    state = collect_by_steps(req)
-    date_obj = parse_date(state.get("explicit_date") or state.get("date"))
-    ok_time, _msg_time, time_str, start_dt, end_dt = parse_and_validate_timeperiod(state.get("booking_time"))
-    size_norm = normalize_room_size(state.get("room_size"))
+def handle_menu_check(req):
+    return _menu_entry(req)
 
-    if date_obj and ok_time and size_norm:
-        state["date"] = date_obj.strftime("%d/%m/%Y")
-        _commit_valid_time(state, start_dt, end_dt, time_str)
-        state["time"] = time_str
-        state["room_size"] = size_norm
-        auto_cat = auto_category_from_size(size_norm)
-        state["room_category"] = auto_cat if auto_cat else None
-        for k in ("room_id", "room_type", "slots", "slots_json"):
-            state.pop(k, None)
-        return jsonify({
-            "fulfillmentText": "",
-            "outputContexts": _sticky_outcontexts(req, state, keep_menu=True, extra_ctx=[(CTX_READY_TO_BOOK, 5)]),
-            "followupEventInput": {"name": "EVT_BOOK", "languageCode": "en"},
-        })
 
-    return jsonify({
-        "fulfillmentText": "",
-        "outputContexts": _sticky_outcontexts(req, state, keep_menu=True),
-        "followupEventInput": {"name": "EVT_CHECK", "languageCode": "en"},
-    })
+def handle_menu_book(req):
+    return _menu_entry(req)
 
 
 def handle_menu_cancel(req):
@@ -1273,9 +2078,8 @@ def handle_menu_cancel(req):
 
 
 def handle_menu_info(req):
-    lines = [ln for ln in RESPONSE["library_info"].split("\n") if ln.strip()]
     return jsonify({
-        "fulfillmentMessages": [{"text": {"text": [ln]}} for ln in lines],
+        "fulfillmentMessages": _LIBRARY_INFO_MESSAGES,
         "outputContexts": _sticky_outcontexts(req),
     })
 
@@ -1283,7 +2087,7 @@ def handle_menu_info(req):
 def handle_book_room(req):
     state = collect_by_steps(req)
     date_obj = parse_date(state.get("date") or state.get("explicit_date"))
-    ok, msg, time_str, start_dt, end_dt = parse_and_validate_timeperiod(state.get("booking_time"))
+    ok, msg, time_str, start_dt, end_dt = _validate_time_cached(state)
     if not date_obj:
         return jsonify({
             "fulfillmentText": "⚠ Please provide a valid date (today/tomorrow).",
@@ -1292,20 +2096,21 @@ def handle_book_room(req):
     if not ok:
         return jsonify({"fulfillmentText": msg, "outputContexts": _sticky_outcontexts(req, state)})
 
-    state["date"] = date_obj.strftime("%d/%m/%Y")
+    state["date"] = _date_str(date_obj)
     _commit_valid_time(state, start_dt, end_dt, time_str)
 
     for k in ("room_id", "room_type", "slots", "slots_json"):
         state.pop(k, None)
 
-    cat = auto_category_from_size(state.get("room_size"))
+    size_val = state.get("room_size")
+    cat = auto_category_from_size(size_val)
     if not cat:
         return jsonify({
             "fulfillmentText": "I couldn't understand the group size. Please enter a number (e.g., 1 or 3).",
             "outputContexts": _sticky_outcontexts(req, state),
         })
     state["room_category"] = cat
-    internal_type = room_type_from_size_and_category(state.get("room_size"), cat)
+    internal_type = room_type_from_size_and_category(size_val, cat)
     if not internal_type:
         return jsonify({
             "fulfillmentText": "Unsupported group size for available rooms.",
@@ -1313,11 +2118,12 @@ def handle_book_room(req):
         })
 
     raw_sid_turn = req.get("queryResult", {}).get("parameters", {}).get("student_id")
-    raw_sid_state = state.get("student_id")
-    sid_now = normalize_student_id(raw_sid_turn or raw_sid_state)
-    if sid_now:
-        state["student_id"] = sid_now
-    hold_sid = state.get("student_id") or "PENDING"
+    sid = normalize_student_id(raw_sid_turn or state.get("student_id"))
+    if sid:
+        state["student_id"] = sid
+    else:
+        sid = state.get("student_id")
+    hold_sid = sid or "PENDING"
 
     room_id, slots, reason = find_and_hold_room_for_period(
         date_obj, start_dt, end_dt, internal_type, str(hold_sid)
@@ -1336,24 +2142,24 @@ def handle_book_room(req):
     state["room_id"] = room_id
     slots = [int(round(x)) for x in (slots or [])]
     state["slots"] = slots
-    state["slots_json"] = json.dumps(slots)
-
-    _dbg_kv("BOOK_ROOM — STAGED STATE", {
-        "date": state.get("date"),
-        "time": state.get("time"),
-        "room_type": state.get("room_type"),
-        "room_id": state.get("room_id"),
-        "slots": state.get("slots"),
-        "slots_json": state.get("slots_json"),
-        "student_id": state.get("student_id"),
-    })
+    state["slots_json"] = slots_to_csv(slots)
+
+    if _debug_on():
+        _dbg_kv("BOOK_ROOM — STAGED STATE", {
+            "date": state.get("date"),
+            "time": state.get("time"),
+            "room_type": internal_type,
+            "room_id": room_id,
+            "slots": slots,
+            "slots_json": state.get("slots_json"),
+            "student_id": sid,
+        })
 
-    size_val = state.get("room_size")
     size_display = str(int(size_val)) if isinstance(size_val, float) and size_val.is_integer() else str(size_val)
-    sid_line = f" Student ID: {state['student_id']}." if state.get("student_id") else ""
+    sid_line = f" Student ID: {sid}." if sid else ""
     confirm_text = (
-        f"Let me confirm your booking: a {_display_room_type(internal_type)} in room {room_id} "
-        f"for {size_display} person{_def_plur(size_display)} on {state['date']} from {state['time']}.{sid_line} "
+        f"Let me confirm your booking: a {ROOM_TYPE_DISPLAY.get(internal_type) or internal_type} in room {room_id} "
+        f"for {size_display} person{'' if size_display == '1' else 's'} on {state['date']} from {state['time']}.{sid_line} "
         "Say 'Yes' to confirm or 'No' to cancel."
     )
 
@@ -1370,17 +2176,18 @@ def handle_confirm_booking(req):
     _dbg_kv("CONFIRM — STORE BEFORE MERGE", store or {})
     _dbg_kv("CONFIRM — CTX BEFORE MERGE", ctx or {})
 
-    params = {**(store or {}), **(ctx or {})}
-    for k in ("room_type", "room_id", "slots", "slots_json", "booking_time", "date"):
-        if k not in params or params.get(k) in ("", None, []):
-            if store and store.get(k) not in ("", None, []):
-                params[k] = store[k]
+    # Single overlay pass: context wins, but an empty context value never
+    # clobbers stored state (same rule collect_by_steps applies per key).
+    params = dict(store or {})
+    for k, v in (ctx or {}).items():
+        if v not in _EMPTY:
+            params[k] = v
 
     if (not params.get("slots")) and params.get("slots_json"):
         try:
-            params["slots"] = json.loads(params["slots_json"])
+            params["slots"] = slots_from_csv(params["slots_json"])
         except Exception:
-            logging.exception("Failed to json-load slots_json in confirm")
+            logging.exception("Failed to decode slots_json in confirm")
             params["slots"] = []
 
     _dbg_kv("CONFIRM — PARAMS AFTER MERGE/REBUILD", params)
@@ -1400,8 +2207,15 @@ def handle_confirm_booking(req):
             "outputContexts": _sticky_outcontexts(req, booking_params=params, extra_ctx=[(CTX_AWAIT_CONFIRM, 5)]),
         })
 
-    date_obj = datetime.strptime(params["date"], "%d/%m/%Y").date()
-    ok, _, _, start_dt, end_dt = parse_and_validate_timeperiod(params.get("booking_time"))
+    # O(1) duplicate guard (Redis hash / warm cache) before any Sheets work.
+    if params.get("date") and has_active_booking(student_id, params["date"]):
+        return jsonify({
+            "fulfillmentText": _MSG_ALREADY_BOOKED,
+            "outputContexts": _sticky_outcontexts(req, params),
+        })
+
+    date_obj = _fast_ddmmyyyy(params["date"])
+    ok, _, _, start_dt, end_dt = _validate_time_cached(params)
     if not ok:
         return jsonify({"fulfillmentText": "Time invalid.", "outputContexts": _sticky_outcontexts(req, params)})
     start_dt, end_dt = _align_time_to_date(start_dt, end_dt, date_obj)
@@ -1421,15 +2235,31 @@ def handle_confirm_booking(req):
             "outputContexts": _sticky_outcontexts(req, params),
         })
 
-    finalize_booking(
-        student_id=str(student_id),
-        date_obj=date_obj,
-        start_dt=start_dt,
-        end_dt=end_dt,
-        internal_room_type=params["room_type"],
-        room_id=params["room_id"],
-        slots=params["slots"],
-    )
+    if FINALIZE_ASYNC:
+        # Reply now; the writes settle in the background. The HOLD cells keep
+        # the slots reserved either way, so a failed finalize loses only the
+        # Bookings row — logged below for manual recovery.
+        fut = _SHEETS_POOL.submit(
+            finalize_booking,
+            student_id=str(student_id),
+            date_obj=date_obj,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            internal_room_type=params["room_type"],
+            room_id=params["room_id"],
+            slots=params["slots"],
+        )
+        fut.add_done_callback(_log_finalize_result)
+    else:
+        finalize_booking(
+            student_id=str(student_id),
+            date_obj=date_obj,
+            start_dt=start_dt,
+            end_dt=end_dt,
+            internal_room_type=params["room_type"],
+            room_id=params["room_id"],
+            slots=params["slots"],
+        )
     return jsonify({
         "fulfillmentText": "✅ Your booking has been saved successfully. Enter hi to go back to main menu.",
         "outputContexts": _sticky_outcontexts(req, booking_params={"student_id": None}, extra_ctx=[(CTX_AWAIT_CONFIRM, 0)]),
@@ -1452,7 +2282,7 @@ def handle_cancel_booking(req):
     n = cancel_by_student_and_date(student_id, date_obj)
     if n > 0:
         return jsonify({
-            "fulfillmentText": f"Got it. Booking for {student_id} on {date_obj.strftime('%d/%m/%Y')} {'has' if n == 1 else 'have'} been cancelled.",
+            "fulfillmentText": f"Got it. Booking for {student_id} on {_date_str(date_obj)} {'has' if n == 1 else 'have'} been cancelled.",
             "outputContexts": _sticky_outcontexts(req, booking_params={"student_id": student_id}),
         })
     else:
@@ -1495,7 +2325,7 @@ def handle_cancel_after_confirmation(req):
         slots = params.get("slots") or []
         sid = normalize_student_id(params.get("student_id")) or "PENDING"
 
-        date_obj = datetime.strptime(date_str, "%d/%m/%Y").date() if date_str else None
+        date_obj = _fast_ddmmyyyy(date_str) if date_str else None
 
         # Attempt to clear any HOLDs we placed for this staged selection
         cleared = release_hold_for_state(date_obj, room_id, [int(round(x)) for x in slots], sid=sid)
@@ -1510,36 +2340,46 @@ def handle_cancel_after_confirmation(req):
         reset.pop(k, None)
 
     return jsonify({
-        "fulfillmentText": RESPONSE["cancel_confirm"],
+        "fulfillmentText": _MSG_CANCEL_CONFIRM,
         "outputContexts": _sticky_outcontexts(req, booking_params=reset),
     })
 
 
 def handle_library_info(req):
     # BUGFIX: Previously referenced a non-existent key "Library_Info_Response"
-    return jsonify({"fulfillmentText": RESPONSE["library_info"], "outputContexts": _sticky_outcontexts(req)})
+    return jsonify({"fulfillmentText": _MSG_LIBRARY_INFO, "outputContexts": _sticky_outcontexts(req)})
+
+
+_DEFAULT_BYTES = _prebaked_json({"fulfillmentText": RESPONSE["unknown"]})
 
 
 def handle_default(req):
-    return jsonify({"fulfillmentText": RESPONSE["unknown"]})
+    # No contexts to emit, so the serialized body never changes.
+    return app.response_class(_DEFAULT_BYTES, mimetype="application/json")
 
 # ===============================
 # Intent Map
 # ===============================
+# Keys are interned so the webhook lookup can short-circuit on pointer
+# identity instead of re-hashing the full intent string every request.
 INTENT_HANDLERS = {
-    "Welcome": handle_welcome,
-    "Menu_CheckAvailability": handle_menu_check,
-    "Menu_BookRoom": handle_menu_book,
-    "Menu_CancelBooking": handle_menu_cancel,
-    "Menu_LibraryInfo": handle_menu_info,
-    "CheckAvailability": handle_flow,
-    "book_room": handle_book_room,
-    "ConfirmBooking": handle_confirm_booking,
-    "CancelBooking": handle_cancel_booking,
-    "CancelAfterConfirmation": handle_cancel_after_confirmation,
-    "LibraryInfo": handle_library_info,
+    sys.intern("Welcome"): handle_welcome,
+    sys.intern("Menu_CheckAvailability"): handle_menu_check,
+    sys.intern("Menu_BookRoom"): handle_menu_book,
+    sys.intern("Menu_CancelBooking"): handle_menu_cancel,
+    sys.intern("Menu_LibraryInfo"): handle_menu_info,
+    sys.intern("CheckAvailability"): handle_flow,
+    sys.intern("book_room"): handle_book_room,
+    sys.intern("ConfirmBooking"): handle_confirm_booking,
+    sys.intern("CancelBooking"): handle_cancel_booking,
+    sys.intern("CancelAfterConfirmation"): handle_cancel_after_confirmation,
+    sys.intern("LibraryInfo"): handle_library_info,
 }
 
+# Pre-bound lookup: skips the INTENT_HANDLERS global load and attribute
+# resolution of .get on every webhook call.
+_dispatch = INTENT_HANDLERS.get
+
 # ===============================
 # Webhook entry
 # ===============================
@@ -1547,24 +2387,30 @@ INTENT_HANDLERS = {
 def webhook():
     t0 = pytime.monotonic()
     try:
-        req = request.get_json(force=True, silent=True) or {}
-        intent = req.get("queryResult", {}).get("intent", {}).get("displayName", "UnknownIntent")
-        raw_turn_params = req.get("queryResult", {}).get("parameters", {}) or {}
+        # cache=False: handlers only ever see the `req` dict we pass down,
+        # so there is no second get_json() call to serve from the cache.
+        req = request.get_json(force=True, silent=True, cache=False) or {}
+        query_result = req.get("queryResult") or {}
+        intent = sys.intern((query_result.get("intent") or {}).get("displayName", "UnknownIntent"))
+        raw_turn_params = query_result.get("parameters") or {}
         _dbg_kv("RAW TURN PARAMS", raw_turn_params)
         logging.info("==============================📥 Incoming Intent: %s ==============================", intent)
 
         update_session_store(get_session_id(req), raw_turn_params)
 
-        handler = INTENT_HANDLERS.get(intent, handle_default)
+        handler = _dispatch(intent, handle_default)
 
         if pytime.monotonic() - t0 > 3.5:
             logging.warning("⏱ Budget exceeded before handler; returning fast fallback.")
             return jsonify({"fulfillmentText": "One moment… Please try again."})
 
         response = handler(req)
-        logging.info("📤 Fulfillment response: %s",
-                     response.get_json() if hasattr(response, "get_json") else str(response))
-        logging.info("⏱ Webhook handler time = %.3fs", pytime.monotonic() - t0)
+        if _info_on():
+            # get_json() re-parses the serialized body; only pay for it
+            # when the line will actually be emitted.
+            logging.info("📤 Fulfillment response: %s",
+                         response.get_json() if hasattr(response, "get_json") else str(response))
+            logging.info("⏱ Webhook handler time = %.3fs", pytime.monotonic() - t0)
         return response
     except Exception:
         logging.exception("Webhook crashed")
@@ -1576,16 +2422,17 @@ def webhook():
 @app.route("/debug/test-sheets", methods=["GET"])
 def debug_test_sheets():
     try:
+        import uuid
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         ws_bookings.append_row([
             f"TEST-{uuid.uuid4().hex[:6].upper()}",
             "9999999",
-            date.today().strftime("%d/%m/%Y"),
+            _date_str(_today()),
             "08:00 AM",
             "08:30 AM",
             "DISCUSSION-S",
             "S-01",
-            json.dumps([1]),
+            slots_to_csv([1]),
             ts,
             "active",
         ])
@@ -1595,6 +2442,16 @@ def debug_test_sheets():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@app.route("/debug/flush-bookings", methods=["POST"])
+def debug_flush_bookings():
+    try:
+        n = _flush_pending_bookings()
+        return jsonify({"ok": True, "flushed": n})
+    except Exception as e:
+        logging.exception("❌ /debug/flush-bookings failed")
+        return jsonify({"ok": False, "error": str(e)}), 500
+
+
 @app.route("/debug/session", methods=["GET"])
 def debug_session_dump():
     try:
@@ -1610,5 +2467,11 @@ def health():
 # Local run (Render uses gunicorn)
 # ===============================
 if __name__ == "__main__":
+    # Local development only. Production runs under gunicorn (see Procfile:
+    # gthread workers), which skips the Werkzeug reloader/debugger entirely;
+    # FLASK_DEBUG must be opted into even here.
     port = int(os.getenv("PORT", "10000"))
-    app.run(host="0.0.0.0", port=port, debug=os.getenv("FLASK_DEBUG", "false").lower() == "true")
+    # threaded=True so local runs overlap Sheets I/O across requests,
+    # matching the gthread worker behavior on Render.
+    app.run(host="0.0.0.0", port=port, threaded=True,
+            debug=os.getenv("FLASK_DEBUG", "false").lower() == "true")